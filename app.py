@@ -1,853 +1,19 @@
+import io
+import logging
 import streamlit as st
-import pdfplumber
-import re
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 
-# HTML color spans
-GREEN = '<span style="color:green">'
-RED = '<span style="color:red">'
-YELLOW = '<span style="color:orange">'  # Orange for better visibility than yellow
-RESET = '</span>'
+from cts_analyzer.analysis import score_cache_info
+from cts_analyzer.catalog import current_catalog
+from cts_analyzer.expiry import EXPIRING_SOON_DAYS, ExpiryIndex
+from cts_analyzer.ingest import Prefetcher, SharedExtractor, refresh_result
+from cts_analyzer.parsing import parse_fingerprint
+from cts_analyzer.render import generate_courses, generate_expiry_table, generate_history_table, generate_obsidian_markdown, generate_timings_table, write_obsidian_zip
+from cts_analyzer.store import history_store, new_batch_id
+from cts_analyzer.timing import TIMING_ENABLED, log_timings, start_timer
 
-# Subjects dict (with all your added search terms)
-subjects = {
-    "ADS-B": {
-        "search_terms": ["ADS-B Overview", "ADS-B Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "Weather": {
-        "search_terms": ["Aviation Weather Theory", "Aviation Weather Theory Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "Aerodynamics": {
-        "search_terms": ["Helicopter Aerodynamics", "Helicopter Specific Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "Airspace": {
-        "search_terms": ["Airspace Overview", "Airspace Overview Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "Brownout": {
-        "search_terms": ["Flat-light, Whiteout, and Brownout Conditions"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "CFIT": {
-        "search_terms": ["Controlled Flight into Terrain Avoidance (CFIT, TAWS, and ALAR) - RW", "Controlled Flight into Terrain Avoidance RW Exam"],
-        "courses": ["Initial (P121)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "CFIT (P135)": {
-        "search_terms": ["Controlled Flight into Terrain Avoidance (CFIT, TAWS, and ALAR) - RW", "Controlled Flight into Terrain Avoidance RW Exam"],
-        "courses": ["Initial (P135)", "Odd Year (P135)", "Even Year (P135)"],
-        "validity_months": 12
-    },
-    "Fire Classes": {
-        "search_terms": ["Classes of Fire and Portable Fire Extinguishers", "Portable Fire Extinguisher Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Even Year (P135)", "Module 1 (P121)"],
-        "validity_months": 12
-    },
-    "H125": {
-        "search_terms": ["H125", "AS-350B3e"],
-        "courses": ["Initial (P135)", "Odd Year (P135)", "Even Year (P135)"],
-        "validity_months": 12
-    },
-    "GPS": {
-        "search_terms": ["GPS (RW IFR-VFR)", "GPS (RW IFR) Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 1 (P121)"],
-        "validity_months": 24
-    },
-    "External Lighting": {
-        "search_terms": ["Helicopter External Lighting", "Helicopter External Lighting Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "METAR and TAF": {
-        "search_terms": ["METAR and TAF", "METAR and TAF Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "First Aid": {
-        "search_terms": ["Physiology and First Aid (RW)", "Physiology and First Aid (RW) Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Even Year (P135)", "Module 1 (P121)", "Module 2 (121)"],
-        "validity_months": 12
-    },
-    "Runway Incursion": {
-        "search_terms": ["Runway Incursion", "Runway Incursion Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "Survival": {
-        "search_terms": ["Survival", "Survival Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "Traffic Advisory System": {
-        "search_terms": ["Traffic Advisory System (TAS)", "Traffic Advisory System"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "Traffic Collision Avoidance System": {
-        "search_terms": ["TCAS II ", "Traffic Collision Avoidance System (TCASII)", "TCAS II - Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "Windshear": {
-        "search_terms": ["Windshear (RW)", "Helicopter Windshear Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Even Year (P135)", "Module 2 (121)"],
-        "validity_months": 24
-    },
-    "CRM": {
-        "search_terms": ["CRM-ADM - Rotor Wing", "Crew Resource Management - Rotor Wing Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "Odd Year (P135)", "Even Year (P135)", "Module 1 (P121)", "Module 2 (121)"],
-        "validity_months": 12
-    },
-    "Basic Indoc": {
-        "search_terms": ["The Helicopter and Jet Company - Indoc (NEW)", "The Helicopter Company - Indoc - SUPERCEDED", "THC - Indoc - EXAM"],
-        "courses": ["Initial (P121)", "Initial (P135)"],
-        "validity_months": None  # Infinite validity
-    },
-    "SMS": {
-        "search_terms": ["The Helicopter and Jet Company - SMS", "THC - SMS Exam", "SMS Exam"],
-        "courses": ["Initial (P121)", "Initial (P135)", "DG + SMS"],
-        "validity_months": 24
-    },
-    "Hazmat": {
-        "search_terms": [
-            "Hazmat - Will Not Carry",
-            "Hazmat Will Not Carry Exam",
-            "THC - Dangerous Goods Awareness (DGA)-Will Not Carry",
-            "Dangerous Goods Awareness (DGA)",
-            "DGA-Will Not Carry"
-        ],
-        "courses": ["Initial (P121)", "Initial (P135)", "DG + SMS"],
-        "validity_months": 24
-    },
-}
-
-# Threshold for "likely" course match (in %)
-LIKELY_THRESHOLD = 70
-
-# Dynamically build courses dict from subjects
-courses = defaultdict(set)
-for subject, data in subjects.items():
-    for course in data["courses"]:
-        courses[course].add(subject)
-
-def clean_text(text):
-    # Fix common OCR errors in dates, e.g., "202 2024" -> "2024"
-    text = re.sub(r'(\d{3})\s+(\d{4})', lambda m: m.group(2) if m.group(2).startswith(m.group(1)) else m.group(0), text)
-    return text
-
-def extract_text_from_pdf(pdf_file):
-    text = ""
-    try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    except Exception as e:
-        st.error(f"Error extracting text: {e}")
-    return clean_text(text)
-
-month_pattern = re.compile(r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)', re.I)
-
-date_pattern = re.compile(r'(\d{1,2}\s*-\s*[a-z]{3}\s*-\s*\d{4})|(\d{4}\s*-\s*[a-z]{3}\s*-\s*\d{1,2})|(\d{1,2}/\d{1,2}/\d{4})', re.I)
-
-def parse_date(date_str):
-    if not date_str:
-        return None
-    date_str = date_str.replace(' ', '')  # Remove spaces
-    formats = ['%d-%b-%Y', '%Y-%b-%d', '%m/%d/%Y']
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            pass
-    return None
-
-def format_date(date_str):
-    parsed = parse_date(date_str)
-    if parsed:
-        return parsed.strftime('%d %B %Y')
-    return date_str or 'N/A'
-
-def parse_completed_subjects(text):
-    text_lower = text.lower()
-    is_super_condensed = "super condensed report by student" in text_lower
-    lines = text.split('\n')
-    subjects_sections = defaultdict(list)
-    current_subject = None
-    for line in lines:
-        line_lower = line.lower()
-        found = False
-        for sub, data in subjects.items():
-            for term in data["search_terms"]:
-                if term.lower() in line_lower:
-                    current_subject = sub
-                    found = True
-                    break
-            if found:
-                break
-        if current_subject:
-            subjects_sections[current_subject].append(line)
-    completed = {}
-    for subject, section in subjects_sections.items():
-        section_text = '\n'.join(section).lower()
-        # Base month
-        base_month = None
-        base_match = re.search(r'base month\s*[:\s*](\w+)', section_text, re.I)
-        if base_match:
-            base_month = base_match.group(1).capitalize()
-        else:
-            early_text = ' '.join(section[:3]).lower()
-            no_date_early = date_pattern.sub('', early_text)
-            month_match = month_pattern.search(no_date_early)
-            if month_match:
-                base_month = month_match.group(0).capitalize()
-        # Look for exam score and date
-        exam_status = 'PASS'
-        exam_score = None
-        exam_date = None
-        found_exam = False
-        for i, line in enumerate(section):
-            line_clean = line.replace('$', '').lower()
-            if re.search(r'\bexam\b', line_clean):
-                found_exam = True
-                score_found = False
-                for m in range(0, 7):
-                    if i + m < len(section):
-                        sub_line = section[i + m]
-                        sub_line_clean = sub_line.replace('$', '').lower()
-                        score_match = re.search(r'(\d+)\s*%\s*(pass|fail|complete)?', sub_line_clean)
-                        if score_match:
-                            score_num = score_match.group(1)
-                            exam_score = score_num + '%'
-                            status_str = score_match.group(2) or ''
-                            exam_status = 'PASS' if 'pass' in status_str.lower() or 'complete' in status_str.lower() or int(score_num) >= 70 else 'FAIL'
-                            score_found = True
-                            # Find date
-                            date_match = date_pattern.search(sub_line)
-                            if date_match:
-                                exam_date = date_match.group(0)
-                            else:
-                                for p in range(-3, 7):
-                                    q = i + m + p
-                                    if 0 <= q < len(section):
-                                        date_match = date_pattern.search(section[q])
-                                        if date_match:
-                                            exam_date = date_match.group(0)
-                                            break
-                            break
-                if score_found:
-                    break
-        if found_exam and exam_score:
-            completed[subject] = (exam_status, exam_score, base_month, exam_date)
-        elif is_super_condensed:
-            # Fallback for super condensed
-            exam_status = 'PASS'
-            exam_score = '100%'
-            # Find last date in section
-            section_str = '\n'.join(section)
-            dates = [d for group in date_pattern.findall(section_str) for d in group if d]
-            if dates:
-                exam_date = dates[-1]
-            completed[subject] = (exam_status, exam_score, base_month, exam_date)
-
-    return completed
-
-def extract_username(text):
-    # Search near the top: first 10 lines or so
-    lines = text.split('\n')[:10]
-    username_pattern = re.compile(r'(\w+@thc)', re.I)
-    for line in lines:
-        match = username_pattern.search(line)
-        if match:
-            return match.group(1).split('@')[0]
-    return None
-
-def get_color(status_or_perc):
-    if isinstance(status_or_perc, str):
-        return GREEN if 'PASS' in status_or_perc else RED
-    else:
-        if status_or_perc == 100:
-            return GREEN
-        else:
-            return YELLOW
-
-def get_expiry_status(subject_name, completion_date_str):
-    """
-    Calculate expiry status for a subject.
-    Returns: (status, expiry_date, days_remaining, badge_html)
-    status: 'fresh', 'expiring_soon', 'expired', 'infinite'
-    """
-    if not completion_date_str:
-        return ('unknown', None, None, '')
-    
-    validity_months = subjects.get(subject_name, {}).get('validity_months')
-    
-    # Infinite validity (Basic Indoc)
-    if validity_months is None:
-        return ('infinite', None, None, '<span style="background: #e3f2fd; color: #1976d2; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">∞ Valid</span>')
-    
-    completion_date = parse_date(completion_date_str)
-    if not completion_date:
-        return ('unknown', None, None, '')
-    
-    expiry_date = completion_date + timedelta(days=validity_months * 30)
-    today = datetime.now()
-    days_remaining = (expiry_date - today).days
-    
-    if days_remaining < 0:
-        # Expired
-        return ('expired', expiry_date, days_remaining, 
-                f'<span style="background: #ffebee; color: #c62828; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">⚠️ Expired</span>')
-    elif days_remaining <= 60:
-        # Expiring soon (within 60 days)
-        return ('expiring_soon', expiry_date, days_remaining,
-                f'<span style="background: #fff3e0; color: #e65100; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">⏰ {days_remaining}d left</span>')
-    else:
-        # Fresh
-        return ('fresh', expiry_date, days_remaining,
-                f'<span style="background: #e8f5e9; color: #2e7d32; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">✓ Valid</span>')
-
-def generate_table(completed):
-    output = "<table><thead><tr><th>Subject</th><th>Status</th><th>Score</th><th>Base Month</th><th>Date</th><th>Expiry Status</th></tr></thead><tbody>"
-    for subject, (status, score, base_month, date) in sorted(completed.items()):
-        base_str = base_month or 'N/A'
-        score_str = score or 'N/A'
-        date_str = format_date(date)
-        color = get_color(status)
-        status_colored = f"{color}{status}{RESET}"
-        
-        # Get expiry status
-        expiry_status, expiry_date, days_remaining, badge_html = get_expiry_status(subject, date)
-        
-        output += f"<tr><td>{subject}</td><td>{status_colored}</td><td>{score_str}</td><td>{base_str}</td><td>{date_str}</td><td>{badge_html}</td></tr>"
-    output += "</tbody></table>"
-    return output
-
-def get_date_range(completed):
-    """Get the date range of all completed subjects"""
-    dates = []
-    for sub in completed:
-        if completed[sub][0] == 'PASS' and completed[sub][3]:
-            parsed_date = parse_date(completed[sub][3])
-            if parsed_date:
-                dates.append(parsed_date)
-    if dates:
-        start_date = min(dates).strftime('%d %B %Y')
-        end_date = max(dates).strftime('%d %B %Y')
-        return start_date, end_date
-    return None, None
-
-def generate_course_group_summary(group_name, course_list, results):
-    """Generate summary for a single course group"""
-    output = f"<h4 style='margin-bottom: 0.5rem;'>{group_name}:</h4><ul style='margin-top: 0.5rem;'>"
-    
-    # Use adjusted percentage for sorting (internal), but display actual counts
-    group_results = []
-    for name in course_list:
-        if name in results:
-            adjusted_perc = results[name]['completion_percentage']
-            completed_count = results[name]['completed_count']
-            total_count = results[name]['total_count']
-            group_results.append((name, adjusted_perc, completed_count, total_count))
-    
-    group_results.sort(key=lambda x: x[1], reverse=True)  # Sort by adjusted percentage
-    
-    for i, (name, adjusted_perc, completed_count, total_count) in enumerate(group_results):
-        # Calculate raw percentage for coloring
-        raw_perc = (completed_count / total_count * 100) if total_count > 0 else 0
-        color = get_color(raw_perc)
-        count_str = f"({completed_count}/{total_count})"
-        
-        # Create anchor ID for linking
-        anchor_id = name.replace(' ', '_').replace('(', '').replace(')', '')
-        
-        # Check for incomplete/failed subjects
-        missing_count = total_count - completed_count
-        warning_badge = ""
-        if i == 0 and completed_count > 0:  # Most likely course
-            if missing_count > 0:
-                # Has missing or failed subjects
-                warning_badge = f' <span style="background: #ffebee; color: #c62828; padding: 0.2rem 0.6rem; border-radius: 4px; font-size: 0.85rem; font-weight: 600; margin-left: 0.5rem;">⚠️ {missing_count} Missing</span>'
-        
-        # Highlight the most likely (first one after sorting)
-        if i == 0 and completed_count > 0:
-            if missing_count > 0:
-                # Incomplete - show with warning
-                output += f"<li style='margin: 0.5rem 0; padding: 0.75rem; background: #fff3e0; border-left: 4px solid #f57c00; border-radius: 4px;'><strong>⭐ <a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></strong> <span style='background: #fff; color: #f57c00; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.85rem; border: 1px solid #f57c00;'>Most Likely</span>{warning_badge}</li>"
-            else:
-                # Complete - show with success
-                output += f"<li style='margin: 0.5rem 0; padding: 0.75rem; background: #e8f5e9; border-left: 4px solid #4caf50; border-radius: 4px;'><strong>⭐ <a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></strong> <span style='background: #d4edda; color: #155724; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.85rem;'>✓ Complete & Most Likely</span></li>"
-        else:
-            output += f"<li style='margin: 0.5rem 0;'><a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></li>"
-    output += "</ul>"
-    return output
-
-def generate_courses(results, completed):
-    # Group courses
-    course_groups = {
-        'P121 Courses': ['Initial (P121)', 'Module 1 (P121)', 'Module 2 (121)'],
-        'P135 Courses': ['Initial (P135)', 'Odd Year (P135)', 'Even Year (P135)'],
-        'Other': ['DG + SMS']
-    }
-    
-    # Get overall date range
-    start_date, end_date = get_date_range(completed)
-    
-    output = ""
-    
-    # Show date range prominently at the top
-    if start_date and end_date:
-        output += f"""
-        <div class="date-banner">
-            <h2 style='margin: 0; color: white;'>📅 Training Period</h2>
-            <p style='margin: 0.5rem 0 0 0; font-size: 1.2rem; font-weight: 500;'>{start_date} — {end_date}</p>
-        </div>
-        """
-    
-    output += "<div class='course-summary'>"
-    output += "<h3 style='margin-top: 0;'>🎯 Most Likely Course Lists</h3>"
-    
-    # Display course groups in a more compact way
-    output += "<div style='display: flex; gap: 2rem; flex-wrap: wrap;'>"
-    for group_name, course_list in course_groups.items():
-        output += f"<div style='flex: 1; min-width: 300px;'>{generate_course_group_summary(group_name, course_list, results)}</div>"
-    output += "</div>"
-    
-    output += "</div>"
-    
-    output += "<br><h3 style='color: #2d3748;'>📋 Detailed Course Breakdowns</h3>"
-    
-    # Show details for each group
-    for group_name, course_list in course_groups.items():
-        output += f"<h4>{group_name}:</h4>"
-        group_results = []
-        for name in course_list:
-            if name in results:
-                adjusted_perc = results[name]['completion_percentage']
-                completed_count = results[name]['completed_count']
-                total_count = results[name]['total_count']
-                group_results.append((name, adjusted_perc, completed_count, total_count))
-        
-        group_results.sort(key=lambda x: x[1], reverse=True)
-        
-        for name, adjusted_perc, completed_count, total_count in group_results:
-            if completed_count > 0:
-                # Create anchor for linking
-                anchor_id = name.replace(' ', '_').replace('(', '').replace(')', '')
-                
-                date_info = ""
-                dates = []
-                for sub in courses[name]:
-                    if sub in completed and completed[sub][0] == 'PASS' and completed[sub][3]:
-                        parsed_date = parse_date(completed[sub][3])
-                        if parsed_date:
-                            dates.append(parsed_date)
-                if dates:
-                    start_date = min(dates).strftime('%d %B %Y')
-                    end_date = max(dates).strftime('%d %B %Y')
-                    date_info = f"<br><span style='color: #6c757d; font-size: 0.9rem;'>📅 {start_date} — {end_date}</span>"
-                
-                output += f"""
-                <div class='report-card' id='{anchor_id}' style='margin-top: 1rem;'>
-                    <h4 style='margin: 0 0 0.5rem 0; color: #2d3748;'>{name} <span style='color: #6c757d; font-weight: normal;'>({completed_count}/{total_count})</span></h4>
-                    {date_info}
-                </div>
-                """
-                output += "<table><thead><tr><th>Subject</th><th>Status</th><th>Score</th><th>Base Month</th><th>Date</th><th>Expiry Status</th></tr></thead><tbody>"
-                all_subs = courses[name]
-                for sub in sorted(all_subs):
-                    if sub in completed:
-                        status, score, base_mo, date = completed[sub]
-                        color = get_color(status)
-                        base_str = base_mo or 'N/A'
-                        score_str = score or 'N/A'
-                        date_str = format_date(date)
-                        status_colored = f"{color}{status}{RESET}"
-                        
-                        # Get expiry status
-                        expiry_status, expiry_date, days_remaining, badge_html = get_expiry_status(sub, date)
-                        
-                        output += f"<tr><td>{sub}</td><td>{status_colored}</td><td>{score_str}</td><td>{base_str}</td><td>{date_str}</td><td>{badge_html}</td></tr>"
-                    else:
-                        output += f"<tr><td>{sub}</td><td>{RED}Not Completed{RESET}</td><td>N/A</td><td>N/A</td><td>N/A</td><td>N/A</td></tr>"
-                output += "</tbody></table>"
-    
-    # Add all subjects at the bottom
-    output += "<br><h3 style='color: #2d3748;'>📚 All Subjects Overview</h3>"
-    output += "<div class='report-card'>"
-    output += generate_table(completed)
-    output += "</div>"
-    
-    return output
-
-def generate_obsidian_markdown():
-    """Generate Obsidian-compatible markdown with checkboxes"""
-    
-    def get_next_assignments(selected_courses, completed, base_month):
-        """Determine what should be assigned next based on completed courses"""
-        assignments = []
-        warnings = []
-        
-        # Get current date info
-        current_year = datetime.now().year
-        
-        # Determine next base month year (future base month)
-        next_base_year = None
-        if base_month:
-            # Parse base month to get the month number
-            try:
-                month_num = datetime.strptime(base_month, '%B').month
-                # If this month has passed this year, use next year
-                if month_num < datetime.now().month:
-                    next_base_year = current_year + 1
-                elif month_num == datetime.now().month:
-                    # If it's this month, could be this year or next depending on day
-                    next_base_year = current_year + 1  # Default to next year to be safe
-                else:
-                    next_base_year = current_year
-            except:
-                next_base_year = current_year + 1
-        
-        # Check P121 progression
-        p121_courses = [c for c in selected_courses if 'P121' in c or c == 'Module 2 (121)']
-        if p121_courses:
-            if 'Initial (P121)' in p121_courses:
-                assignments.append("Module 1 (P121)")
-            elif 'Module 1 (P121)' in p121_courses:
-                assignments.append("Module 2 (121)")
-            elif 'Module 2 (121)' in p121_courses:
-                assignments.append("Module 1 (P121)")
-        
-        # Check P135 progression
-        p135_courses = [c for c in selected_courses if 'P135' in c]
-        if p135_courses:
-            if 'Initial (P135)' in p135_courses:
-                # Determine odd or even year based on next base month
-                if next_base_year:
-                    if next_base_year % 2 == 0:
-                        assignments.append("Even Year (P135)")
-                    else:
-                        assignments.append("Odd Year (P135)")
-                else:
-                    assignments.append("Odd Year (P135) or Even Year (P135) - check base month")
-            
-            elif 'Odd Year (P135)' in p135_courses or 'Even Year (P135)' in p135_courses:
-                # Check if they did it in the right year
-                last_course = 'Odd Year (P135)' if 'Odd Year (P135)' in p135_courses else 'Even Year (P135)'
-                
-                # Get the year when this course was completed
-                dates = []
-                if last_course in courses:
-                    for subject in courses[last_course]:
-                        if subject in completed and completed[subject][0] == 'PASS' and completed[subject][3]:
-                            parsed_date = parse_date(completed[subject][3])
-                            if parsed_date:
-                                dates.append(parsed_date)
-                
-                if dates:
-                    completion_year = max(dates).year
-                    course_type = 'odd' if 'Odd' in last_course else 'even'
-                    year_type = 'odd' if completion_year % 2 == 1 else 'even'
-                    
-                    # Check if completed in wrong year
-                    if course_type != year_type:
-                        warnings.append(f"⚠️ WARNING: {last_course} was completed in {completion_year} ({year_type} year) - sequence may be incorrect")
-                
-                # Determine next assignment based on next base month
-                if next_base_year:
-                    if next_base_year % 2 == 0:
-                        assignments.append("Even Year (P135)")
-                    else:
-                        assignments.append("Odd Year (P135)")
-                else:
-                    assignments.append("Check next base month for Odd/Even Year (P135)")
-        
-        # Only check DG + SMS if there are selected courses
-        if not selected_courses:
-            return assignments, warnings
-        
-        # Check DG + SMS status
-        dg_completed = False
-        sms_completed = False
-        dg_date = None
-        sms_date = None
-
-        dg_dates = []
-        for subject_name in ["Hazmat", "Dangerous Goods"]:
-            if subject_name in completed and completed[subject_name][0] == 'PASS' and completed[subject_name][3]:
-                parsed_date = parse_date(completed[subject_name][3])
-                if parsed_date:
-                    dg_dates.append(parsed_date)
-        if dg_dates:
-            dg_completed = True
-            dg_date = max(dg_dates)
-
-        sms_dates = []
-        for subject_name in ["SMS"]:
-            if subject_name in completed and completed[subject_name][0] == 'PASS' and completed[subject_name][3]:
-                parsed_date = parse_date(completed[subject_name][3])
-                if parsed_date:
-                    sms_dates.append(parsed_date)
-        if sms_dates:
-            sms_completed = True
-            sms_date = max(sms_dates)
-        
-        # Check if DG + SMS needs to be assigned
-        # Rule: If DG + SMS was written more than 14 months before the upcoming base month, assign it
-        # This ensures it's still valid for the cycle after next
-        needs_dg_sms = False
-        if not dg_completed or not sms_completed:
-            needs_dg_sms = True
-        elif dg_date and sms_date and base_month:
-            most_recent = max(dg_date, sms_date)
-            
-            # Calculate upcoming base month
-            try:
-                month_num = datetime.strptime(base_month, '%B').month
-                current_year = datetime.now().year
-                
-                # Find next occurrence of this base month
-                if month_num < datetime.now().month or (month_num == datetime.now().month and datetime.now().day > 15):
-                    upcoming_base_date = datetime(current_year + 1, month_num, 1)
-                else:
-                    upcoming_base_date = datetime(current_year, month_num, 1)
-                
-                # Calculate 14 months before upcoming base month
-                fourteen_months_before_base = upcoming_base_date - timedelta(days=425)  # ~14 months
-                
-                # If DG + SMS was written more than 14 months before upcoming base month, assign it
-                if most_recent < fourteen_months_before_base:
-                    needs_dg_sms = True
-            except:
-                # Fallback: use simple 12 month rule
-                twelve_months_from_now = datetime.now() + timedelta(days=365)
-                expiry_date = most_recent + timedelta(days=730)
-                if expiry_date < twelve_months_from_now:
-                    needs_dg_sms = True
-        elif dg_date and sms_date:
-            # No base month, use simple 12 month rule
-            most_recent = max(dg_date, sms_date)
-            twelve_months_from_now = datetime.now() + timedelta(days=365)
-            expiry_date = most_recent + timedelta(days=730)
-            if expiry_date < twelve_months_from_now:
-                needs_dg_sms = True
-        
-        if needs_dg_sms:
-            assignments.append("DG + SMS")
-        
-        return assignments, warnings
-    
-    md = "# Training Analysis Report\n\n"
-    md += f"**Generated:** {datetime.now().strftime('%d %B %Y at %H:%M')}\n\n"
-    md += "---\n\n"
-    
-    if 'manual_selections' not in st.session_state or 'pdf_results' not in st.session_state:
-        return "No data available for export."
-    
-    for idx, result in enumerate(st.session_state.pdf_results):
-        pdf_key = f"{idx}_{result['username']}"
-        selected_courses = st.session_state.manual_selections.get(pdf_key, [])
-        
-        username = result['username'] or 'Unknown User'
-        md += f"## {username}\n\n"
-        
-        # Current Modules
-        if selected_courses:
-            md += "**Current Modules:**\n"
-            for course in selected_courses:
-                # Get date range for this course
-                dates = []
-                if course in courses:
-                    for subject in courses[course]:
-                        if subject in result['completed'] and result['completed'][subject][0] == 'PASS' and result['completed'][subject][3]:
-                            parsed_date = parse_date(result['completed'][subject][3])
-                            if parsed_date:
-                                dates.append(parsed_date)
-                
-                if dates:
-                    start_date = min(dates).strftime('%d %B %Y')
-                    end_date = max(dates).strftime('%d %B %Y')
-                    md += f"- {course} ({start_date} — {end_date})\n"
-                else:
-                    md += f"- {course}\n"
-            md += "\n"
-        else:
-            md += "**Current Modules:** _None selected_\n\n"
-        
-        # Missing/Failed Subjects
-        missing_subjects = []
-        failed_subjects = []
-        
-        for course in selected_courses:
-            if course in courses:
-                for subject in courses[course]:
-                    if subject not in result['completed']:
-                        missing_subjects.append(f"{subject} (for {course})")
-                    elif result['completed'][subject][0] != 'PASS':
-                        failed_subjects.append(f"{subject} (for {course})")
-        
-        if missing_subjects or failed_subjects:
-            md += "**Missing/Failed Subjects:**\n"
-            for subj in missing_subjects:
-                md += f"- [ ] {subj} - MISSING\n"
-            for subj in failed_subjects:
-                md += f"- [ ] {subj} - FAILED\n"
-            md += "\n"
-        else:
-            md += "**Status:** ✅ All subjects complete\n\n"
-        
-        # Get base month from completed subjects
-        base_month = None
-        for subject, (status, score, base_mo, date) in result['completed'].items():
-            if base_mo:
-                base_month = base_mo
-                break
-        
-        # Determine next assignments
-        next_assignments, warnings = get_next_assignments(selected_courses, result['completed'], base_month)
-        
-        # Show warnings if any
-        if warnings:
-            md += "**⚠️ Warnings:**\n"
-            for warning in warnings:
-                md += f"- {warning}\n"
-            md += "\n"
-        
-        # Action items
-        md += "**Action Items:**\n"
-        md += "- [ ] Updated in CTS\n"
-        md += "- [ ] Updated in FleetPlan\n"
-        
-        # Add next assignments including missing subjects
-        if next_assignments or missing_subjects or failed_subjects:
-            md += "\n**Next to Assign:**\n"
-            
-            # List each course/module
-            for assignment in next_assignments:
-                md += f"- [ ] {assignment}\n"
-            
-            # Add missing/failed subjects to assign
-            for subj in missing_subjects:
-                subject_name = subj.split(' (for ')[0]
-                md += f"- [ ] {subject_name}\n"
-            for subj in failed_subjects:
-                subject_name = subj.split(' (for ')[0]
-                md += f"- [ ] {subject_name}\n"
-        
-        md += "\n---\n\n"
-    
-    return md
-    
-    output = "<h3>Likely Lists (Most Likely in Each Group):</h3>"
-    
-    # For each group, find the most likely course
-    for group_name, course_list in course_groups.items():
-        output += f"<h4>{group_name}:</h4><ul>"
-        # Use adjusted percentage for sorting (internal), but display actual counts
-        group_results = []
-        for name in course_list:
-            if name in results:
-                adjusted_perc = results[name]['completion_percentage']
-                completed_count = results[name]['completed_count']
-                total_count = results[name]['total_count']
-                group_results.append((name, adjusted_perc, completed_count, total_count))
-        
-        group_results.sort(key=lambda x: x[1], reverse=True)  # Sort by adjusted percentage
-        
-        for i, (name, adjusted_perc, completed_count, total_count) in enumerate(group_results):
-            # Calculate raw percentage for coloring
-            raw_perc = (completed_count / total_count * 100) if total_count > 0 else 0
-            color = get_color(raw_perc)
-            count_str = f"({completed_count}/{total_count})"
-            
-            # Highlight the most likely (first one after sorting)
-            if i == 0 and completed_count > 0:
-                output += f"<li><strong>⭐ {name} {count_str}: {color}{completed_count}/{total_count}{RESET}</strong> (Most Likely)</li>"
-            else:
-                output += f"<li>{name} {count_str}: {color}{completed_count}/{total_count}{RESET}</li>"
-        output += "</ul>"
-    
-    output += "<h3>List Details:</h3>"
-    
-    # Show details for each group
-    for group_name, course_list in course_groups.items():
-        output += f"<h4>{group_name}:</h4>"
-        group_results = []
-        for name in course_list:
-            if name in results:
-                adjusted_perc = results[name]['completion_percentage']
-                completed_count = results[name]['completed_count']
-                total_count = results[name]['total_count']
-                group_results.append((name, adjusted_perc, completed_count, total_count))
-        
-        group_results.sort(key=lambda x: x[1], reverse=True)
-        
-        for name, adjusted_perc, completed_count, total_count in group_results:
-            if completed_count > 0:
-                date_info = ""
-                dates = []
-                for sub in courses[name]:
-                    if sub in completed and completed[sub][0] == 'PASS' and completed[sub][3]:
-                        parsed_date = parse_date(completed[sub][3])
-                        if parsed_date:
-                            dates.append(parsed_date)
-                if dates:
-                    start_date = min(dates).strftime('%d %B %Y')
-                    end_date = max(dates).strftime('%d %B %Y')
-                    date_info = f" - Start: {start_date}, End: {end_date}"
-                output += f"<p><strong>{name} ({completed_count}/{total_count}){date_info}</strong></p>"
-                output += "<table><thead><tr><th>Subject</th><th>Status</th><th>Score</th><th>Base Month</th><th>Date</th></tr></thead><tbody>"
-                all_subs = courses[name]
-                for sub in sorted(all_subs):
-                    if sub in completed:
-                        status, score, base_mo, date = completed[sub]
-                        color = get_color(status)
-                        base_str = base_mo or 'N/A'
-                        score_str = score or 'N/A'
-                        date_str = format_date(date)
-                        status_colored = f"{color}{status}{RESET}"
-                        output += f"<tr><td>{sub}</td><td>{status_colored}</td><td>{score_str}</td><td>{base_str}</td><td>{date_str}</td></tr>"
-                    else:
-                        output += f"<tr><td>{sub}</td><td>{RED}Not Completed{RESET}</td><td>N/A</td><td>N/A</td><td>N/A</td></tr>"
-                output += "</tbody></table>"
-    return output
-
-def analyze_courses(completed):
-    results = {}
-    total_passed = len([s for s in completed if completed[s][0] == 'PASS'])
-    
-    for course_name, req_subjects in courses.items():
-        total = len(req_subjects)
-        completed_count = sum(1 for sub in req_subjects if sub in completed and completed[sub][0] == 'PASS')
-        completion_perc = (completed_count / total * 100) if total else 0
-        
-        # Smart classification: if a student passed MORE subjects than exist in this course,
-        # and got 100% of this course, they likely took a larger course
-        # Penalize smaller courses when student has passed many more subjects
-        penalty = 0
-        if completion_perc == 100 and total_passed > total:
-            # The more extra subjects they passed, the less likely this smaller course is
-            extra_subjects = total_passed - total
-            penalty = min(extra_subjects * 5, 40)  # Max 40% penalty
-        
-        adjusted_perc = max(0, completion_perc - penalty)
-        results[course_name] = {
-            'completion_percentage': adjusted_perc,
-            'completed_count': completed_count,
-            'total_count': total
-        }
-    
-    return results
+# Timing log lines are single JSON objects, so keep the format bare
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 # Custom CSS for beautiful design
 st.markdown("""
@@ -973,6 +139,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def shared_extractor():
+    """One extraction queue and result cache for every session on this server"""
+    return SharedExtractor()
+
+@st.cache_resource
+def reparse_history(fingerprint):
+    """Bring stored results up to date with the subjects table, once per catalog version (see parse_fingerprint)"""
+    return history_store.reparse()
+
 # Streamlit app
 st.title("📊 PDF Exam Analyzer")
 
@@ -992,7 +168,16 @@ if 'pdf_results' not in st.session_state or not st.session_state.pdf_results:
     
     uploaded_files = st.file_uploader("Upload PDF(s)", type="pdf", accept_multiple_files=True, label_visibility="collapsed")
     
+    # Start extracting as soon as files land in the uploader; files removed from it are cancelled
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(extractor=shared_extractor())
+    prefetcher = st.session_state.prefetcher
+    prefetcher.update({uploaded_file.file_id: uploaded_file for uploaded_file in uploaded_files or []})
+    
     if uploaded_files:
+        queued = prefetcher.queue_position()
+        queue_note = f" · ⏳ #{queued} in the server queue" if queued else ""
+        st.caption(f"⚙️ Pre-extracted {prefetcher.ready} of {len(prefetcher)} PDFs{queue_note}")
         if st.button("🚀 Process PDFs", type="primary", use_container_width=True):
             # Store advanced mode setting
             st.session_state.advanced_mode = advanced_mode
@@ -1002,21 +187,32 @@ if 'pdf_results' not in st.session_state or not st.session_state.pdf_results:
             
             # Process all PDFs and store results in session state
             st.session_state.pdf_results = []
+            # New batch: rendered reports of the previous one no longer apply
+            st.session_state.analysis_version = st.session_state.get('analysis_version', 0) + 1
+            st.session_state.report_html = {}
+            # Files that couldn't be analyzed (worker killed, timed out or crashed), listed on the results page
+            st.session_state.failed_files = []
             
-            with st.spinner('Processing PDFs...'):
-                for uploaded_file in uploaded_files:
-                    text = extract_text_from_pdf(uploaded_file)
-                    if text:
-                        username = extract_username(text)
-                        completed = parse_completed_subjects(text)
-                        if completed:
-                            results = analyze_courses(completed)
-                            st.session_state.pdf_results.append({
-                                'filename': uploaded_file.name,
-                                'username': username,
-                                'completed': completed,
-                                'results': results
-                            })
+            file_ids = [uploaded_file.file_id for uploaded_file in uploaded_files]
+            batch = new_batch_id()
+            progress = st.progress(0.0, text=f"Processing 0 of {len(file_ids)} PDFs...")
+            # Only waits for whatever the background extraction hasn't finished yet
+            queue_note = st.empty()
+            waiting = lambda position: queue_note.caption(f"⏳ Server busy: waiting for a free extraction slot (#{position} in the queue)")
+            for done, result in enumerate(prefetcher.results(file_ids, on_wait=waiting), start=1):
+                queue_note.empty()
+                if result and 'error' in result:
+                    st.session_state.failed_files.append((result['filename'], result['error']))
+                    st.error(f"{result['filename']}: {result['error']}")
+                elif result:
+                    st.session_state.pdf_results.append(result)
+                    history_store.save(result, batch)
+                progress.progress(done / len(file_ids), text=f"Processing {done} of {len(file_ids)} PDFs...")
+            progress.empty()
+            queue_note.empty()
+            # Kept in the URL, so this browser tab (and only it) can restore the batch after a refresh
+            if history_store.enabled and st.session_state.pdf_results:
+                st.query_params['batch'] = batch
             
             # Initialize navigation index
             if st.session_state.pdf_results:
@@ -1024,9 +220,118 @@ if 'pdf_results' not in st.session_state or not st.session_state.pdf_results:
                 st.rerun()
             else:
                 st.warning("No subjects detected in any of the uploaded PDFs.")
+    
+    # Bring back this tab's last batch (e.g. after a browser refresh) from the history store instead of re-extracting it,
+    # or show the latest transcript of every pilot, including those stored by the watch-folder daemon
+    restore = restored = None
+    if history_store.enabled:
+        restore_col1, restore_col2 = st.columns(2)
+        with restore_col1:
+            last_batch = st.query_params.get('batch')
+            if st.button("♻️ Restore Last Batch", use_container_width=True, disabled=not last_batch,
+                         help="The batch last processed in this browser tab"):
+                restore = lambda: history_store.load_batch(last_batch)
+        with restore_col2:
+            if st.button("📡 Load Fleet View", use_container_width=True, help="Latest stored transcript of every pilot"):
+                restore = history_store.latest_per_pilot
+    if restore:
+        with st.spinner("Loading stored transcripts..."):
+            reparse_history(parse_fingerprint())
+            restored = restore()
+    if restored is not None:
+        if restored:
+            st.session_state.advanced_mode = advanced_mode
+            st.session_state.manual_selections = {}
+            st.session_state.pdf_results = restored
+            st.session_state.failed_files = []
+            st.session_state.analysis_version = st.session_state.get('analysis_version', 0) + 1
+            st.session_state.report_html = {}
+            st.session_state.current_index = 0
+            st.rerun()
+        else:
+            st.info("Nothing stored yet.")
+
+# Fragments: widgets inside rerun only their own function, so ticking a course or exporting
+# doesn't re-run the page (CSS, dashboard, the pilot's report) around them
+@st.fragment
+def course_selection(pdf_key, results):
+    """Advanced mode course checkboxes for one pilot, kept in st.session_state.manual_selections[pdf_key]"""
+    # Initialize selections for this PDF if not exists
+    if 'manual_selections' not in st.session_state:
+        st.session_state.manual_selections = {}
+    if pdf_key not in st.session_state.manual_selections:
+        st.session_state.manual_selections[pdf_key] = []
+    
+    selected_courses = []
+    for group_name, course_list in current_catalog().course_groups.items():
+        st.markdown(f"**{group_name}:**")
+        cols = st.columns(len(course_list))
+        for idx, course_name in enumerate(course_list):
+            with cols[idx]:
+                # Show completion count
+                if course_name in results:
+                    count = results[course_name]['completed_count']
+                    total = results[course_name]['total_count']
+                    is_checked = course_name in st.session_state.manual_selections[pdf_key]
+                    if st.checkbox(f"{course_name} ({count}/{total})", value=is_checked, key=f"checkbox_{pdf_key}_{course_name}"):
+                        if course_name not in selected_courses:
+                            selected_courses.append(course_name)
+    
+    # Update selections
+    st.session_state.manual_selections[pdf_key] = selected_courses
+
+@st.fragment
+def obsidian_export():
+    # Per-pilot sections are reused until that pilot's selections change
+    if 'markdown_sections' not in st.session_state:
+        st.session_state.markdown_sections = {}
+    export_col1, export_col2 = st.columns(2)
+    with export_col1:
+        generate_markdown = st.button("📥 Generate Obsidian Markdown", type="primary", use_container_width=True)
+    with export_col2:
+        generate_zip = st.button("🗜️ One Note per Pilot (.zip)", use_container_width=True)
+    
+    if generate_zip:
+        # Large batches: skip the single-file preview and write the notes straight into an archive
+        archive = io.BytesIO()
+        write_obsidian_zip(archive, st.session_state.get('pdf_results') or [], st.session_state.get('manual_selections') or {},
+                           st.session_state.markdown_sections)
+        archive.seek(0)
+        st.download_button(
+            label="💾 Download Notes (.zip)",
+            data=archive,
+            file_name=f"training_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+    
+    if generate_markdown:
+        markdown_content = generate_obsidian_markdown(st.session_state.get('pdf_results'), st.session_state.get('manual_selections'),
+                                                      st.session_state.markdown_sections)
+        
+        # Display preview
+        st.markdown("**Preview:**")
+        st.code(markdown_content, language="markdown")
+        
+        # Download button
+        st.download_button(
+            label="💾 Download Markdown File",
+            data=markdown_content,
+            file_name=f"training_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+            mime="text/markdown",
+            use_container_width=True
+        )
 
 # Display results with navigation
 if 'pdf_results' in st.session_state and st.session_state.pdf_results:
+    # The catalog file was edited since these results were analyzed: bring them up to date in place, so the session carries on
+    catalog = current_catalog()
+    if st.session_state.get('catalog', catalog) is not catalog:
+        st.session_state.pdf_results = [refresh_result(result) for result in st.session_state.pdf_results]
+        st.session_state.analysis_version = st.session_state.get('analysis_version', 0) + 1
+        st.session_state.report_html = {}
+    st.session_state.catalog = catalog
+    
     total_pdfs = len(st.session_state.pdf_results)
     current_idx = st.session_state.get('current_index', 0)
     
@@ -1035,9 +340,45 @@ if 'pdf_results' in st.session_state and st.session_state.pdf_results:
     with col_reset2:
         if st.button("🔄 New Analysis", type="secondary"):
             st.session_state.pdf_results = []
+            st.session_state.failed_files = []
+            st.session_state.report_html = {}
             st.session_state.current_index = 0
             st.rerun()
     
+    failed_files = st.session_state.get('failed_files') or []
+    if failed_files:
+        with st.expander(f"⚠️ {len(failed_files)} PDF(s) could not be analyzed", expanded=True):
+            for filename, error in failed_files:
+                st.error(f"{filename}: {error}")
+    
+    # Fleet-wide expiry index, built once per batch and day; its reference today is used for every badge below
+    index_key = (st.session_state.get('analysis_version', 0), datetime.now().date())
+    if st.session_state.get('expiry_index_key') != index_key:
+        st.session_state.expiry_index = ExpiryIndex(st.session_state.pdf_results)
+        st.session_state.expiry_index_key = index_key
+    expiry_index = st.session_state.expiry_index
+    
+    with st.expander(f"⏳ Fleet Expiry Dashboard ({total_pdfs} pilots)"):
+        dash_col1, dash_col2, dash_col3 = st.columns([2, 2, 1])
+        with dash_col1:
+            expiry_subject = st.selectbox("Subject", ["All subjects"] + expiry_index.subjects, key="expiry_subject")
+        with dash_col2:
+            expiry_view = st.radio("Show", ["Expiring soon", "Expired"], horizontal=True, key="expiry_view")
+        with dash_col3:
+            expiry_days = st.number_input("Within days", min_value=0, value=EXPIRING_SOON_DAYS, step=30,
+                                          key="expiry_days", disabled=(expiry_view == "Expired"))
+        subject_filter = None if expiry_subject == "All subjects" else expiry_subject
+        if expiry_view == "Expired":
+            expiry_entries = expiry_index.expired(subject_filter)
+        else:
+            expiry_entries = expiry_index.expiring_within(expiry_days, subject_filter)
+        st.caption(f"{len(expiry_entries)} of {len(expiry_index)} dated subjects · as of {expiry_index.today.strftime('%d %B %Y')}")
+        if expiry_entries:
+            # Long lists (e.g. everything expired in a large batch) are cut off rather than rendered in full
+            st.markdown(generate_expiry_table(expiry_entries[:500], expiry_index, st.session_state.pdf_results), unsafe_allow_html=True)
+            if len(expiry_entries) > 500:
+                st.caption(f"Showing the first 500 of {len(expiry_entries)}.")
+    
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Navigation controls
@@ -1064,19 +405,21 @@ if 'pdf_results' in st.session_state and st.session_state.pdf_results:
     # Display current PDF results
     current_result = st.session_state.pdf_results[current_idx]
     
-    # File name - small and subtle
+    # File name and extraction backend - small and subtle
+    extraction = current_result.get('extraction', {})
+    extraction_str = f" · extracted via {extraction['backend']}" if extraction else ""
     st.markdown(f"""
     <p style='color: #6c757d; font-size: 0.85rem; margin: 0.5rem 0 1rem 0;'>
-        📄 {current_result['filename']}
+        📄 {current_result['filename']}{extraction_str}
     </p>
     """, unsafe_allow_html=True)
     
     if current_result['username']:
         # Get base month if available
         base_month = None
-        for subject, (status, score, base_mo, date) in current_result['completed'].items():
-            if base_mo:
-                base_month = base_mo
+        for subject_result in current_result['completed'].values():
+            if subject_result.base_month:
+                base_month = subject_result.base_month
                 break
         
         base_month_display = f"<p style='margin: 0.5rem 0 0 0; font-size: 1rem; color: white; opacity: 0.9;'>📅 Base Month: {base_month}</p>" if base_month else ""
@@ -1086,6 +429,12 @@ if 'pdf_results' in st.session_state and st.session_state.pdf_results:
             {base_month_display}
         </div>
         """, unsafe_allow_html=True)
+        
+        # Earlier transcripts of the same pilot from the history store
+        pilot_history = history_store.history(current_result['username'])
+        if len(pilot_history) > 1:
+            with st.expander(f"🗂️ Training History ({len(pilot_history)} transcripts)"):
+                st.markdown(generate_history_table(pilot_history), unsafe_allow_html=True)
     
     # Advanced mode: Manual course selection (at the top)
     if st.session_state.get('advanced_mode', False):
@@ -1097,42 +446,30 @@ if 'pdf_results' in st.session_state and st.session_state.pdf_results:
         """, unsafe_allow_html=True)
         st.markdown("<br>", unsafe_allow_html=True)
         
-        # Initialize selections for this PDF if not exists
-        pdf_key = f"{current_idx}_{current_result['username']}"
-        if 'manual_selections' not in st.session_state:
-            st.session_state.manual_selections = {}
-        if pdf_key not in st.session_state.manual_selections:
-            st.session_state.manual_selections[pdf_key] = []
-        
-        # Group courses for selection
-        course_groups = {
-            'P121 Courses': ['Initial (P121)', 'Module 1 (P121)', 'Module 2 (121)'],
-            'P135 Courses': ['Initial (P135)', 'Odd Year (P135)', 'Even Year (P135)'],
-            'Other': ['DG + SMS']
-        }
-        
-        selected_courses = []
-        for group_name, course_list in course_groups.items():
-            st.markdown(f"**{group_name}:**")
-            cols = st.columns(len(course_list))
-            for idx, course_name in enumerate(course_list):
-                with cols[idx]:
-                    # Show completion count
-                    if course_name in current_result['results']:
-                        count = current_result['results'][course_name]['completed_count']
-                        total = current_result['results'][course_name]['total_count']
-                        is_checked = course_name in st.session_state.manual_selections[pdf_key]
-                        if st.checkbox(f"{course_name} ({count}/{total})", value=is_checked, key=f"checkbox_{pdf_key}_{course_name}"):
-                            if course_name not in selected_courses:
-                                selected_courses.append(course_name)
-        
-        # Update selections
-        st.session_state.manual_selections[pdf_key] = selected_courses
+        course_selection(f"{current_idx}_{current_result['username']}", current_result['results'])
         
         st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
     
-    # Generate and display the full report (includes date range, likely lists, details, and all subjects at bottom)
-    st.markdown(generate_courses(current_result['results'], current_result['completed']), unsafe_allow_html=True)
+    # Generate and display the full report (includes date range, likely lists, details, and all subjects at bottom).
+    # Rendered once per pilot and batch; the date is part of the key because expiry badges count days from today.
+    if 'report_html' not in st.session_state:
+        st.session_state.report_html = {}
+    report_key = (st.session_state.get('analysis_version', 0), current_idx, datetime.now().date())
+    render_timer = start_timer()
+    with render_timer.stage('render HTML'):
+        if report_key not in st.session_state.report_html:
+            st.session_state.report_html[report_key] = generate_courses(current_result['results'], current_result['completed'], expiry_index.today)
+        report_html = st.session_state.report_html[report_key]
+    st.markdown(report_html, unsafe_allow_html=True)
+    log_timings(current_result['filename'], render_timer.stages, event='render')
+    
+    # Per-stage timings for this PDF
+    if TIMING_ENABLED:
+        with st.expander("⏱️ Performance"):
+            stage_timings = {**current_result.get('timings', {}), **render_timer.stages}
+            st.markdown(generate_timings_table(stage_timings), unsafe_allow_html=True)
+            memo = score_cache_info()
+            st.caption(f"Course scoring memo (this server process): {memo['hit_rate']:.0%} hits over {memo['hits'] + memo['misses']} analyses, {memo['size']} distinct pass-sets")
     
     # Progress indicator at bottom
     st.markdown("<br><br>", unsafe_allow_html=True)
@@ -1148,19 +485,4 @@ if 'pdf_results' in st.session_state and st.session_state.pdf_results:
     if st.session_state.get('advanced_mode', False):
         st.markdown("<hr>", unsafe_allow_html=True)
         st.markdown("### 📋 Export to Obsidian")
-        
-        if st.button("📥 Generate Obsidian Markdown", type="primary", use_container_width=True):
-            markdown_content = generate_obsidian_markdown()
-            
-            # Display preview
-            st.markdown("**Preview:**")
-            st.code(markdown_content, language="markdown")
-            
-            # Download button
-            st.download_button(
-                label="💾 Download Markdown File",
-                data=markdown_content,
-                file_name=f"training_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                mime="text/markdown",
-                use_container_width=True
-            )
+        obsidian_export()
@@ -0,0 +1,30 @@
+"""CTS training transcript analyzer: the Streamlit-free engine behind app.py.
+
+Importing the package is cheap; pdfplumber/pdfminer are only imported when a PDF is actually read,
+and numpy only when a fleet is analyzed.
+"""
+from .analysis import analyze_courses, most_likely_courses, ranked_courses, score_cache_info
+from .catalog import Catalog, current_catalog
+from .expiry import EXPIRING_SOON_DAYS, ExpiryIndex, get_expiry_date, get_expiry_status
+from .extract import EXTRACTION_BACKENDS, extract_text_from_pdf, iter_pdf_pages, parse_pdf
+from .fleet import FleetAnalysis, analyze_fleet
+from .parsing import (
+    PARSER_VERSION,
+    Status,
+    SubjectResult,
+    TranscriptParser,
+    clean_text,
+    extract_username,
+    format_date,
+    parse_completed_subjects,
+    parse_date,
+    parse_fingerprint,
+)
+from .store import TranscriptStore, history_store
+
+def __getattr__(name):
+    # subjects, courses, COURSE_GROUPS and LIKELY_THRESHOLD follow the catalog file, so they are looked up on access
+    if name in ('subjects', 'courses', 'COURSE_GROUPS', 'LIKELY_THRESHOLD'):
+        from . import catalog
+        return getattr(catalog, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
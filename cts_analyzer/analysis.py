@@ -0,0 +1,87 @@
+"""Course likelihood scoring from a pilot's completed subjects."""
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+from .catalog import current_catalog
+
+# Distinct pass-sets remembered; pilots who did the same courses share one, so a batch has far fewer than pilots
+SCORE_CACHE_SIZE = 1024
+
+def passed_set(completed):
+    return frozenset(subject for subject, result in completed.items() if result.passed)
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def _score(passed, catalog):
+    """(results, ranking) for one pass-set under one catalog; shared between callers, so never modified"""
+    results = {}
+    total_passed = len(passed)
+    
+    for course_name, req_subjects in catalog.courses.items():
+        total = len(req_subjects)
+        completed_count = len(req_subjects & passed)
+        completion_perc = (completed_count / total * 100) if total else 0
+        
+        # Smart classification: if a student passed MORE subjects than exist in this course,
+        # and got 100% of this course, they likely took a larger course
+        # Penalize smaller courses when student has passed many more subjects
+        penalty = 0
+        if completion_perc == 100 and total_passed > total:
+            # The more extra subjects they passed, the less likely this smaller course is
+            extra_subjects = total_passed - total
+            penalty = min(extra_subjects * 5, 40)  # Max 40% penalty
+        
+        adjusted_perc = max(0, completion_perc - penalty)
+        results[course_name] = {
+            'completion_percentage': adjusted_perc,
+            'completed_count': completed_count,
+            'total_count': total
+        }
+    
+    # Each group's courses by adjusted percentage, most likely first (ties keep group order)
+    ranking = {
+        group_name: tuple(sorted((name for name in course_list if name in results),
+                                 key=lambda name: results[name]['completion_percentage'], reverse=True))
+        for group_name, course_list in catalog.course_groups.items()
+    }
+    return results, ranking
+
+# Memo hits and misses of analyze_courses alone: ranked_courses and most_likely_courses look up a pass-set
+# analyze_courses has just scored, so counting them would report a hit for every pilot
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+def _lookup(completed, counted=False):
+    with _stats_lock:
+        misses = _score.cache_info().misses
+        scored = _score(passed_set(completed), current_catalog())
+        if counted:
+            _stats['misses' if _score.cache_info().misses > misses else 'hits'] += 1
+    return scored
+
+def analyze_courses(completed):
+    """Completion and adjusted percentage of every course. Scores only depend on which subjects were passed,
+    so they are memoized per pass-set (see score_cache_info); the returned dicts are the caller's own.
+    """
+    results, _ = _lookup(completed, counted=True)
+    return {course_name: dict(scores) for course_name, scores in results.items()}
+
+def ranked_courses(completed):
+    """{group: course names, most likely first}, as ordered by analyze_courses(completed) percentages; memoized with them
+    (hence read-only)
+    """
+    return MappingProxyType(_lookup(completed)[1])
+
+def score_cache_info():
+    """Hits, misses and hit rate of analyze_courses on the pass-set memo, and its size"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+        size = _score.cache_info().currsize
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'size': size, 'hit_rate': hits / lookups if lookups else 0.0}
+
+def most_likely_courses(completed):
+    """Most likely course per group: the first of ranked_courses(completed), provided at least one subject was passed"""
+    results, ranking = _lookup(completed)
+    return {group_name: ranked[0] if ranked and results[ranked[0]]['completed_count'] > 0 else None
+            for group_name, ranked in ranking.items()}
@@ -0,0 +1,162 @@
+"""Benchmark the parsing pipeline on synthetic transcripts.
+
+    python -m cts_analyzer.bench --transcripts 50 --subjects 15 --pages 4 --noise 0.05 --layout both
+
+Each stage (extraction per backend, clean_text, parsing, analyze_courses, HTML rendering) is timed
+separately, plus analyze_fleet over the whole batch, and reported as pages/s and transcripts/s so regressions show up per stage.
+"""
+import argparse
+import io
+import random
+import time
+
+from .analysis import analyze_courses, score_cache_info
+from .catalog import current_catalog
+from .extract import EXTRACTION_BACKENDS
+from .fleet import analyze_fleet, requirement_matrix
+from .parsing import clean_text, parse_completed_subjects
+from .render import generate_courses
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+LAYOUTS = ('normal', 'condensed')
+
+def random_date(rng):
+    return f"{rng.randint(1, 28)}-{rng.choice(MONTHS)}-{rng.randint(2021, 2025)}"
+
+def add_noise(line, rng, noise):
+    """OCR-style damage: the split-year artifact clean_text repairs, stray '$' signs and misread characters"""
+    if rng.random() >= noise:
+        return line
+    kind = rng.randrange(3)
+    if kind == 0:
+        for year in ('2021', '2022', '2023', '2024', '2025'):
+            if year in line:
+                return line.replace(year, f"{year[:3]} {year}", 1)
+    if kind == 1:
+        pos = rng.randint(0, len(line))
+        return line[:pos] + '$' + line[pos:]
+    if line:
+        pos = rng.randrange(len(line))
+        return line[:pos] + rng.choice('lI1O0 ') + line[pos + 1:]
+    return line
+
+def synthetic_transcript(rng, layout='normal', n_subjects=15, n_pages=4, noise=0.0):
+    """Transcript text as a list of pages (each a list of lines) in the given layout.
+    Subject blocks are padded with lesson lines so the transcript fills n_pages.
+    """
+    username = f"pilot{rng.randint(1, 9999)}@thc"
+    if layout == 'condensed':
+        lines = ["Super Condensed Report by Student", f"Student: {username}", f"Printed {random_date(rng)}"]
+    else:
+        lines = ["Training Transcript", f"Username: {username}", f"Base Month: {rng.choice(MONTHS)}"]
+    subjects = current_catalog().subjects
+    chosen = rng.sample(list(subjects), min(n_subjects, len(subjects)))
+    blocks = []
+    for subject in chosen:
+        date = random_date(rng)
+        block = [subjects[subject]["search_terms"][0]]
+        if layout == 'condensed':
+            block.append(f"Completed {date}")
+        else:
+            block.append(f"Enrolled {random_date(rng)}")
+            block.append(f"{subjects[subject]['search_terms'][-1]} - Exam")
+            score = rng.randint(55, 100)
+            block.append(f"{score}% {'Pass' if score >= 70 else 'Fail'} {date}")
+        blocks.append(block)
+    lines_per_page = 45
+    filler = max(0, n_pages * lines_per_page - len(lines) - sum(len(block) for block in blocks))
+    for i, block in enumerate(blocks):
+        lines += block
+        lines += [f"Lesson {j + 1} - Completed" for j in range(filler // len(blocks) + (i < filler % len(blocks)))]
+    lines = [add_noise(line, rng, noise) for line in lines]
+    return [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('latin-1', 'replace')
+
+def write_pdf(pages):
+    """Minimal PDF with one Helvetica text line per input line - enough for both extraction backends"""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for lines in pages:
+        stream = b"BT /F1 10 Tf 12 TL 40 760 Td\n" + b"".join(b"(" + _pdf_string(line) + b") Tj T*\n" for line in lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
+
+def run(transcripts, backends):
+    """Time each stage over (layout, pages, pdf bytes) transcripts. Returns {stage: seconds}."""
+    timings = {f"extract ({backend})": 0.0 for backend in backends}
+    timings.update({'clean_text': 0.0, 'parse': 0.0, 'analyze_courses': 0.0, 'analyze_fleet': 0.0, 'render HTML': 0.0})
+    batch = []
+    requirement_matrix()  # Import numpy and build the catalog matrix outside the timed stage
+    for pages, pdf in transcripts:
+        raw = None
+        for backend in backends:
+            start = time.perf_counter()
+            backend_pages = list(EXTRACTION_BACKENDS[backend](io.BytesIO(pdf)))
+            timings[f"extract ({backend})"] += time.perf_counter() - start
+            raw = raw or ''.join(page + "\n" for page in backend_pages)
+        start = time.perf_counter()
+        text = clean_text(raw)
+        timings['clean_text'] += time.perf_counter() - start
+        start = time.perf_counter()
+        completed = parse_completed_subjects(text)
+        timings['parse'] += time.perf_counter() - start
+        batch.append(completed)
+        start = time.perf_counter()
+        results = analyze_courses(completed)
+        timings['analyze_courses'] += time.perf_counter() - start
+        start = time.perf_counter()
+        generate_courses(results, completed)
+        timings['render HTML'] += time.perf_counter() - start
+    start = time.perf_counter()
+    analyze_fleet(batch)
+    timings['analyze_fleet'] += time.perf_counter() - start
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cts_analyzer.bench', description=__doc__.splitlines()[0])
+    parser.add_argument('--transcripts', type=int, default=20, help="Transcripts per layout")
+    parser.add_argument('--subjects', type=int, default=15, help="Subjects per transcript")
+    parser.add_argument('--pages', type=int, default=4, help="Pages per transcript")
+    parser.add_argument('--noise', type=float, default=0.0, help="Probability of OCR damage per line")
+    parser.add_argument('--layout', choices=LAYOUTS + ('both',), default='both')
+    parser.add_argument('--backends', nargs='+', choices=list(EXTRACTION_BACKENDS), default=list(EXTRACTION_BACKENDS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    for layout in (LAYOUTS if args.layout == 'both' else (args.layout,)):
+        transcripts = []
+        for _ in range(args.transcripts):
+            pages = synthetic_transcript(rng, layout, args.subjects, args.pages, args.noise)
+            transcripts.append((pages, write_pdf(pages)))
+        total_pages = sum(len(pages) for pages, _ in transcripts)
+        timings = run(transcripts, args.backends)
+        print(f"\n{layout} layout: {len(transcripts)} transcripts, {total_pages} pages")
+        print(f"{'stage':<24}{'total s':>10}{'ms/transcript':>15}{'pages/s':>12}{'transcripts/s':>15}")
+        for stage, seconds in timings.items():
+            per_transcript = seconds / len(transcripts) * 1000
+            pages_rate = total_pages / seconds if seconds else float('inf')
+            transcript_rate = len(transcripts) / seconds if seconds else float('inf')
+            print(f"{stage:<24}{seconds:>10.3f}{per_transcript:>15.2f}{pages_rate:>12.1f}{transcript_rate:>15.1f}")
+    memo = score_cache_info()
+    print(f"\nanalyze_courses memo: {memo['hit_rate']:.0%} hits ({memo['hits']} of {memo['hits'] + memo['misses']}), {memo['size']} pass-sets")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Persistent on-disk cache of extracted transcripts, keyed by PDF content hash."""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from .extract import EXTRACTOR_VERSION
+from .parsing import parse_fingerprint, SubjectResult
+
+# Set CTS_CACHE_MAX_BYTES=0 to turn the cache off
+CACHE_DIR = Path(os.environ.get('CTS_CACHE_DIR', Path.home() / '.cache' / 'cts-analyzer'))
+CACHE_MAX_BYTES = int(os.environ.get('CTS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Writes between directory scans; in between, eviction goes by this process's running size estimate
+EVICT_SCAN_WRITES = 200
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path):
+    """content_hash of a file, read in chunks rather than all at once"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+class TranscriptCache:
+    """Extracted text and parsed results per PDF, as separate JSON files.
+    Text is kept under the content hash plus EXTRACTOR_VERSION and parsed results under the hash plus parse_fingerprint(),
+    so when the subjects table changes, old text is re-parsed rather than extracted again.
+    Entries are touched on every hit, so file mtime doubles as the LRU order for eviction.
+    The directory is only scanned for eviction when the running size estimate passes max_bytes, or every
+    EVICT_SCAN_WRITES writes to catch up with other processes writing to the same directory.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size = None  # Bytes at the last scan plus those written since; None until the first scan
+        self._writes = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _text_path(self, digest):
+        return self.directory / f"{digest}-text{EXTRACTOR_VERSION}.json"
+
+    def _path(self, digest):
+        return self.directory / f"{digest}-{parse_fingerprint()}.json"
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def get_text(self, digest):
+        """Return (text, complete) for a content hash, or None on a miss. complete is False when
+        extraction stopped before the last page (see parse_pdf).
+        """
+        if not self.enabled:
+            return None
+        entry = self._read(self._text_path(digest))
+        return (entry['text'], entry['complete']) if entry else None
+
+    def get(self, digest):
+        """Return (text, complete, completed) for a content hash, or None unless both text and results
+        for the current subjects table are cached
+        """
+        if not self.enabled:
+            return None
+        entry = self._read(self._path(digest))
+        text = entry and self.get_text(digest)
+        if not text:
+            return None
+        completed = {subject: SubjectResult.from_dict(values) for subject, values in entry['completed'].items()}
+        return (*text, completed)
+
+    def put(self, digest, text, complete, completed):
+        if not self.enabled:
+            return
+        self._wrote(self._write(self._text_path(digest), {'text': text, 'complete': complete}))
+        self.put_completed(digest, completed)
+
+    def put_completed(self, digest, completed):
+        """Cache results alone, e.g. when they were re-parsed from cached text"""
+        if not self.enabled:
+            return
+        self._wrote(self._write(self._path(digest), {'completed': {subject: result.to_dict() for subject, result in completed.items()}}))
+
+    def _write(self, path, entry):
+        """Write one entry; returns its size in bytes (0 if it couldn't be written)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent workers never see a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return 0
+        return size
+
+    def _wrote(self, size):
+        self._writes += 1
+        if self._size is not None:
+            self._size += size
+        if self._size is None or self._size > self.max_bytes or self._writes >= EVICT_SCAN_WRITES:
+            self._size = self.evict()
+            self._writes = 0
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes; returns the bytes left"""
+        entries = []
+        total = 0
+        for path in self.directory.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Evicted by another worker in the meantime
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+        return total
+
+transcript_cache = TranscriptCache()
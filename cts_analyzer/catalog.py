@@ -0,0 +1,178 @@
+"""Subject and course catalog: which LMS terms identify each subject, which courses need it, and how long it stays valid.
+
+The catalog lives in a JSON file (catalog.json next to this module, or CTS_CATALOG_PATH):
+
+    {
+        "version": 1,
+        "likely_threshold": 70,
+        "course_groups": {"P121 Courses": ["Initial (P121)", ...], ...},
+        "subjects": {"ADS-B": {"search_terms": [...], "courses": [...], "validity_months": 24}, ...}
+    }
+
+Bump "version" with every edit. current_catalog() re-reads the file whenever its mtime changes, so a running
+server (and its worker processes) picks up new search terms without a restart.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get('CTS_CATALOG_PATH', str(Path(__file__).with_name('catalog.json')))
+
+# current_catalog() is called per parse, analysis and expiry lookup; the file is stat'ed at most this often
+RELOAD_CHECK_SECONDS = 1.0
+
+class SubjectMatcher:
+    """Aho-Corasick automaton over every subject's search terms.
+    match() finds the subject a line belongs to in one pass over the line. When several terms occur,
+    the subject listed first in `subjects` wins, same as checking each subject's terms in turn.
+    """
+
+    def __init__(self, subjects):
+        self.names = list(subjects)
+        terms = [term.lower() for data in subjects.values() for term in data["search_terms"]]
+        # Most lines contain no term at all; one C-level regex search rules those out before walking the automaton
+        self._any_term = re.compile('|'.join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True)))
+        no_match = len(self.names)
+        self._goto = [{}]
+        # Best (lowest) subject index of any term ending at each state, including via fail links
+        self._best = [no_match]
+        for priority, data in enumerate(subjects.values()):
+            for term in data["search_terms"]:
+                state = 0
+                for ch in term.lower():
+                    nxt = self._goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto.append({})
+                        self._best.append(no_match)
+                        self._goto[state][ch] = nxt
+                    state = nxt
+                self._best[state] = min(self._best[state], priority)
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._best[nxt] = min(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+        # Subjects some line can actually match. A subject is shadowed when each of its terms contains
+        # a term of a subject listed earlier (e.g. CFIT (P135) behind CFIT).
+        self.reachable = [name for name, data in subjects.items()
+                          if any(self.match(term.lower()) == name for term in data["search_terms"])]
+
+    def match(self, line_lower):
+        """Return the subject whose term appears in an already-lowercased line, or None"""
+        first = self._any_term.search(line_lower)
+        if not first:
+            return None
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = len(self.names)
+        state = 0
+        # No term starts before the leftmost regex hit
+        for ch in line_lower[first.start():]:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break
+        return self.names[best] if best < len(self.names) else None
+
+class Catalog:
+    """A loaded catalog file, compiled once into everything the analysis needs:
+    subjects (as in the file), courses (course -> set of required subjects), course_groups, validity
+    (subject -> validity_months, None when it never expires) and matcher (a SubjectMatcher over the search terms).
+    Never modified after loading; a changed file gives a new Catalog.
+    """
+
+    def __init__(self, data):
+        try:
+            self.version = data.get('version')
+            self.likely_threshold = data.get('likely_threshold', 70)
+            self.course_groups = {group: list(course_list) for group, course_list in data['course_groups'].items()}
+            self.subjects = data['subjects']
+            for name, subject in self.subjects.items():
+                if not subject['search_terms'] or not all(isinstance(term, str) and term for term in subject['search_terms']):
+                    raise ValueError(f"subject {name!r} needs a list of non-empty search terms")
+                if not isinstance(subject['courses'], list):
+                    raise ValueError(f"subject {name!r}: courses must be a list")
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"malformed catalog: {e!r}") from None
+        self.courses = defaultdict(set)
+        for name, subject in self.subjects.items():
+            for course in subject['courses']:
+                self.courses[course].add(name)
+        self.validity = {name: subject.get('validity_months') for name, subject in self.subjects.items()}
+        self.matcher = SubjectMatcher(self.subjects)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            try:
+                return cls(json.load(f))
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from None
+
+_lock = threading.Lock()
+_loaded = None  # (file stat key, Catalog), replaced as a whole on reload
+_next_check = 0.0
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def current_catalog():
+    """The catalog as of the file's last change. A file that fails to load (mid-edit, invalid JSON)
+    is logged and the previous catalog kept; only the very first load raises.
+    Callers should fetch it once per unit of work (a transcript, a report) so that work sees one catalog throughout.
+    """
+    global _loaded, _next_check
+    loaded = _loaded
+    now = time.monotonic()
+    if loaded is not None and now < _next_check:
+        return loaded[1]
+    with _lock:
+        _next_check = now + RELOAD_CHECK_SECONDS
+        key = _stat_key(CATALOG_PATH)
+        if _loaded is not None and (key is None or key == _loaded[0]):
+            return _loaded[1]
+        try:
+            catalog = Catalog.load(CATALOG_PATH)
+        except (OSError, ValueError) as e:
+            if _loaded is None:
+                raise
+            logger.warning("Catalog %s not reloaded, keeping version %s: %s", CATALOG_PATH, _loaded[1].version, e)
+            _loaded = key, _loaded[1]  # Don't retry until the file changes again
+            return _loaded[1]
+        if _loaded is not None:
+            logger.info("Catalog %s reloaded: version %s", CATALOG_PATH, catalog.version)
+        _loaded = key, catalog
+        return catalog
+
+def __getattr__(name):
+    # The module-level names of the hard-coded catalog this replaced, resolved against the current file
+    catalog = current_catalog()
+    if name == 'subjects':
+        return catalog.subjects
+    if name == 'courses':
+        return catalog.courses
+    if name == 'COURSE_GROUPS':
+        return catalog.course_groups
+    if name == 'LIKELY_THRESHOLD':
+        return catalog.likely_threshold
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,110 @@
+"""Headless batch mode: analyze a directory or glob of transcripts and write one row per pilot.
+
+    python -m cts_analyzer transcripts/ --format csv --output report.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import sys
+from pathlib import Path
+
+from .analysis import most_likely_courses
+from .catalog import current_catalog
+from .ingest import MAX_WORKERS, iter_process_pdfs
+from .store import history_store, new_batch_id
+
+def find_pdfs(patterns):
+    """Expand directories (recursively) and glob patterns into a sorted, de-duplicated list of PDF paths"""
+    paths = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            paths.update(p for p in path.rglob('*') if p.suffix.lower() == '.pdf')
+        else:
+            paths.update(Path(p) for p in glob.glob(pattern, recursive=True) if p.lower().endswith('.pdf'))
+    return sorted(paths)
+
+def get_base_month(completed):
+    for subject_result in completed.values():
+        if subject_result.base_month:
+            return subject_result.base_month
+    return None
+
+def to_record(result):
+    likely = most_likely_courses(result['completed'])
+    return {
+        'filename': result['filename'],
+        'username': result['username'],
+        'base_month': get_base_month(result['completed']),
+        'likely_courses': likely,
+        'completed': {
+            subject: {'status': subject_result.status.value, 'score': subject_result.score_str,
+                      'base_month': subject_result.base_month, 'date': subject_result.raw_date}
+            for subject, subject_result in result['completed'].items()
+        },
+        'results': result['results']
+    }
+
+def to_csv_row(record):
+    row = {
+        'filename': record['filename'],
+        'username': record['username'] or '',
+        'base_month': record['base_month'] or '',
+    }
+    catalog = current_catalog()
+    for group_name in catalog.course_groups:
+        row[f"likely {group_name}"] = record['likely_courses'][group_name] or ''
+    for subject in catalog.subjects:
+        entry = record['completed'].get(subject)
+        row[subject] = ' '.join(filter(None, [entry['status'], entry['score'], entry['date']])) if entry else ''
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cts_analyzer', description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help="json writes one JSON object per line")
+    parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help=f"Worker processes (default: {MAX_WORKERS})")
+    args = parser.parse_args(argv)
+    # Per-file timing lines (CTS_TIMING=0 to silence) go to stderr alongside the progress messages
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    pdfs = find_pdfs(args.paths)
+    if not pdfs:
+        print("No PDFs found.", file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    writer = None
+    analyzed = skipped = failed = 0
+    batch = new_batch_id()
+    try:
+        files = [(str(path), path) for path in pdfs]
+        for (filename, _), result in zip(files, iter_process_pdfs(files, args.workers)):
+            if result is None:
+                skipped += 1
+                print(f"{filename}: no subjects detected", file=sys.stderr)
+                continue
+            if 'error' in result:
+                failed += 1
+                print(f"{filename}: {result['error']}", file=sys.stderr)
+                continue
+            analyzed += 1
+            history_store.save(result, batch)
+            record = to_record(result)
+            if args.format == 'json':
+                out.write(json.dumps(record) + '\n')
+            else:
+                row = to_csv_row(record)
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"{analyzed} analyzed, {skipped} without subjects, {failed} failed", file=sys.stderr)
+    return 1 if failed and not analyzed else 0
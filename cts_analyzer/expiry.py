@@ -0,0 +1,100 @@
+"""Subject expiry from completion date and the catalog's validity period."""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from .catalog import current_catalog
+from .parsing import parse_date
+
+EXPIRING_SOON_DAYS = 60
+
+def get_expiry_date(subject_name, completion_date):
+    """Completion date plus the subject's validity, or None if it never expires"""
+    validity_months = current_catalog().validity.get(subject_name)
+    if validity_months is None:
+        return None
+    return completion_date + timedelta(days=validity_months * 30)
+
+def get_expiry_status(subject_name, completion_date, today=None):
+    """
+    Calculate expiry status for a subject, given its completion datetime (or a date string to parse).
+    today defaults to now; pass one reference time to keep a whole report (or fleet) consistent.
+    Returns: (status, expiry_date, days_remaining, badge_html)
+    status: 'fresh', 'expiring_soon', 'expired', 'infinite'
+    """
+    if not completion_date:
+        return ('unknown', None, None, '')
+    
+    validity_months = current_catalog().validity.get(subject_name)
+    
+    # Infinite validity (Basic Indoc)
+    if validity_months is None:
+        return ('infinite', None, None, '<span style="background: #e3f2fd; color: #1976d2; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">∞ Valid</span>')
+    
+    if isinstance(completion_date, str):
+        completion_date = parse_date(completion_date)
+    if not completion_date:
+        return ('unknown', None, None, '')
+    
+    expiry_date = get_expiry_date(subject_name, completion_date)
+    days_remaining = (expiry_date - (today or datetime.now())).days
+    
+    if days_remaining < 0:
+        # Expired
+        return ('expired', expiry_date, days_remaining, 
+                f'<span style="background: #ffebee; color: #c62828; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">⚠️ Expired</span>')
+    elif days_remaining <= EXPIRING_SOON_DAYS:
+        # Expiring soon (within 60 days)
+        return ('expiring_soon', expiry_date, days_remaining,
+                f'<span style="background: #fff3e0; color: #e65100; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">⏰ {days_remaining}d left</span>')
+    else:
+        # Fresh
+        return ('fresh', expiry_date, days_remaining,
+                f'<span style="background: #e8f5e9; color: #2e7d32; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.75rem; margin-left: 0.5rem;">✓ Valid</span>')
+
+class ExpiryIndex:
+    """Expiry dates of every loaded pilot's subjects, sorted, against a single reference today.
+    Entries are (expiry_date, pilot index, subject), kept both fleet-wide and bucketed per subject,
+    so range queries are two bisects instead of a get_expiry_status call per subject per pilot.
+    Subjects without a validity period (Basic Indoc) or without a usable date are not indexed.
+    """
+
+    def __init__(self, pdf_results, today=None):
+        self.today = today or datetime.now()
+        entries = []
+        for idx, result in enumerate(pdf_results):
+            for subject, subject_result in result['completed'].items():
+                if subject_result.date:
+                    expiry_date = get_expiry_date(subject, subject_result.date)
+                    if expiry_date:
+                        entries.append((expiry_date, idx, subject))
+        entries.sort()
+        self._buckets = {None: entries}
+        for entry in entries:
+            self._buckets.setdefault(entry[2], []).append(entry)
+        self._dates = {subject: [entry[0] for entry in bucket] for subject, bucket in self._buckets.items()}
+
+    def __len__(self):
+        return len(self._buckets[None])
+
+    @property
+    def subjects(self):
+        """Indexed subjects in catalog order"""
+        return [subject for subject in current_catalog().subjects if subject in self._buckets]
+
+    def between(self, start=None, end=None, subject=None):
+        """Entries expiring at or after start and before end (either open-ended), soonest first"""
+        bucket = self._buckets.get(subject, [])
+        dates = self._dates.get(subject, [])
+        lo = bisect_left(dates, start) if start else 0
+        hi = bisect_left(dates, end) if end else len(dates)
+        return bucket[lo:hi]
+
+    def expired(self, subject=None):
+        return self.between(end=self.today, subject=subject)
+
+    def expiring_within(self, days=EXPIRING_SOON_DAYS, subject=None):
+        """Not yet expired and at most `days` whole days left, matching get_expiry_status' days_remaining"""
+        return self.between(self.today, self.today + timedelta(days=days + 1), subject)
+
+    def days_remaining(self, expiry_date):
+        return (expiry_date - self.today).days
@@ -0,0 +1,115 @@
+"""PDF text extraction backends, streamed page by page into the transcript parser."""
+from .parsing import TranscriptParser, clean_text, extract_username
+from .timing import NULL_TIMER
+
+def pdfplumber_pages(pdf_file):
+    """Layout-aware extraction: accurate, but by far the slowest step of the pipeline"""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            page.close()  # Drop the page's cached layout objects before moving on
+            if page_text:
+                yield page_text
+
+def pdfminer_pages(pdf_file, x_tolerance=3, y_tolerance=3):
+    """Raw extraction: runs pdfminer's content stream interpreter without layout analysis,
+    then rebuilds lines by grouping characters on their baseline and ordering them left to right
+    """
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LTChar
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    rsrcmgr = PDFResourceManager()
+    device = PDFPageAggregator(rsrcmgr, laparams=None)
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    for page in PDFPage.get_pages(pdf_file):
+        interpreter.process_page(page)
+        chars = sorted((item for item in device.get_result() if isinstance(item, LTChar)), key=lambda c: -c.y1)
+        lines = []
+        line = []
+        for char in chars:
+            if line and line[0].y1 - char.y1 > y_tolerance:
+                lines.append(line)
+                line = []
+            line.append(char)
+        if line:
+            lines.append(line)
+        page_lines = []
+        for line in lines:
+            line.sort(key=lambda c: c.x0)
+            parts = []
+            prev = None
+            word_break = False
+            for char in line:
+                text = char.get_text()
+                # Like pdfplumber, a blank glyph or a gap wider than x_tolerance ends a word
+                if text.isspace():
+                    word_break = True
+                    continue
+                if prev and (word_break or char.x0 - prev.x1 > x_tolerance):
+                    parts.append(' ')
+                parts.append(text)
+                prev = char
+                word_break = False
+            page_lines.append(''.join(parts))
+        page_text = '\n'.join(page_lines)
+        if page_text:
+            yield page_text
+
+# Extraction backends in the order parse_pdf tries them; each yields the raw text of each non-empty page
+EXTRACTION_BACKENDS = {
+    'pdfminer': pdfminer_pages,
+    'pdfplumber': pdfplumber_pages,
+}
+
+# Bump whenever extracted text changes (a backend, their order, clean_text): cached and stored text is keyed by it
+EXTRACTOR_VERSION = 1
+
+def iter_pdf_pages(pdf_file, backend='pdfplumber'):
+    """Yield the cleaned text of each non-empty page, one page at a time"""
+    for page_text in EXTRACTION_BACKENDS[backend](pdf_file):
+        yield clean_text(page_text)
+
+def extract_text_from_pdf(pdf_file, backend='pdfplumber'):
+    return ''.join(page_text + "\n" for page_text in iter_pdf_pages(pdf_file, backend))
+
+def looks_extracted(parser):
+    """Sanity check for a fast backend's output: a @thc username near the top and at least one subject"""
+    return bool(extract_username(parser.text)) and parser.has_subjects
+
+def parse_pdf(pdf_file, backends=tuple(EXTRACTION_BACKENDS), timer=NULL_TIMER):
+    """Stream pages into a TranscriptParser, and stop opening pages once no later page can change the result.
+    Backends are tried in order until one passes looks_extracted(); the last one is used regardless.
+    The returned parser records the backend used, and whether every page was read (complete). Time spent extracting (per backend) and parsing goes to `timer`.
+    """
+    for i, backend in enumerate(backends):
+        is_last = i == len(backends) - 1
+        pdf_file.seek(0)
+        parser = TranscriptParser()
+        complete = True
+        try:
+            pages = iter_pdf_pages(pdf_file, backend)
+            while True:
+                with timer.stage(f"extract ({backend})"):
+                    page_text = next(pages, None)
+                if page_text is None:
+                    break
+                with timer.stage('parse'):
+                    parser.feed(page_text + "\n")
+                    settled = parser.settled
+                if settled:
+                    pages.close()
+                    complete = False
+                    break
+        except Exception:
+            if is_last:
+                raise
+            continue  # A fast backend choking on a PDF is just another reason to fall back
+        if is_last or looks_extracted(parser):
+            break
+    parser.backend = backend
+    parser.complete = complete
+    return parser
@@ -0,0 +1,79 @@
+"""Fleet-wide course analysis: analyze_courses for every pilot at once as NumPy matrix operations.
+The history store analyzes every transcript it loads this way (Load Fleet View, restored batches).
+
+numpy is imported on first use, like the PDF libraries in extract.py.
+"""
+from .catalog import current_catalog
+
+_requirements = (None, None)  # (catalog, its requirement matrix)
+
+def requirement_matrix():
+    """(course names, subject names, courses x subjects boolean matrix) for the current catalog, built once per catalog"""
+    global _requirements
+    catalog = current_catalog()
+    if _requirements[0] is not catalog:
+        import numpy as np
+        courses = catalog.courses
+        course_names = list(courses)
+        subject_names = sorted({sub for req_subjects in courses.values() for sub in req_subjects})
+        column = {sub: j for j, sub in enumerate(subject_names)}
+        matrix = np.zeros((len(course_names), len(subject_names)), dtype=bool)
+        for i, course_name in enumerate(course_names):
+            matrix[i, [column[sub] for sub in courses[course_name]]] = True
+        _requirements = catalog, (course_names, subject_names, matrix)
+    return _requirements[1]
+
+def pass_matrix(completed_list, subject_names):
+    """pilots x subjects boolean matrix of passed subjects"""
+    import numpy as np
+    column = {sub: j for j, sub in enumerate(subject_names)}
+    matrix = np.zeros((len(completed_list), len(subject_names)), dtype=bool)
+    for i, completed in enumerate(completed_list):
+        for sub, result in completed.items():
+            if result.passed and sub in column:
+                matrix[i, column[sub]] = True
+    return matrix
+
+class FleetAnalysis:
+    """Counts and adjusted percentages for every pilot x course.
+    Row i of each matrix corresponds to completed_list[i], column j to course_names[j].
+    """
+
+    def __init__(self, completed_list):
+        import numpy as np
+        self.course_names, self.subject_names, self.requirements = requirement_matrix()
+        self.passes = pass_matrix(completed_list, self.subject_names)
+        # Passed subjects outside the catalog still count towards the extra-subject penalty
+        total_passed = np.array([sum(1 for result in completed.values() if result.passed)
+                                 for completed in completed_list], dtype=np.int64).reshape(-1, 1)
+
+        self.total_count = self.requirements.sum(axis=1)
+        self.completed_count = self.passes.astype(np.int64) @ self.requirements.T.astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            completion_perc = np.where(self.total_count > 0, self.completed_count / self.total_count * 100, 0.0)
+
+        # Same penalty as analyze_courses: smaller courses completed 100% lose 5% per extra passed subject, max 40%
+        extra_subjects = total_passed - self.total_count
+        penalty = np.where((completion_perc == 100) & (extra_subjects > 0), np.minimum(extra_subjects * 5, 40), 0)
+        self.completion_percentage = np.maximum(0, completion_perc - penalty)
+
+    def __len__(self):
+        return len(self.passes)
+
+    def results(self, i):
+        """analyze_courses-shaped results for pilot i (max(0, ...) keeps its int 0 for courses with nothing passed)"""
+        percentages = self.completion_percentage[i].tolist()
+        counts = self.completed_count[i].tolist()
+        totals = self.total_count.tolist()
+        return {
+            course_name: {
+                'completion_percentage': max(0, percentages[j]),
+                'completed_count': counts[j],
+                'total_count': totals[j]
+            }
+            for j, course_name in enumerate(self.course_names)
+        }
+
+def analyze_fleet(completed_list):
+    """Analyze many pilots' completed dicts in one pass; see FleetAnalysis"""
+    return FleetAnalysis(list(completed_list))
@@ -0,0 +1,307 @@
+"""Parallel ingestion: runs extract -> parse -> analyze for each PDF on a bounded process pool."""
+import io
+import mmap
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import wait
+from contextlib import contextmanager
+
+from .cache import content_hash, transcript_cache
+from .analysis import analyze_courses
+from .extract import parse_pdf
+from .catalog import current_catalog
+from .parsing import extract_username, reparse
+from .timing import log_timings, start_timer
+from .workers import POLL_SECONDS, SupervisedPool, WorkerError
+
+# Extraction is CPU bound, so there is no point in more workers than cores
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# A PDF that hangs extraction or blows up its worker's memory is killed and reported as that file's error.
+# Set either to 0 to turn the limit off.
+PDF_TIMEOUT = float(os.environ.get('CTS_PDF_TIMEOUT', 120))
+PDF_MAX_RSS_BYTES = int(os.environ.get('CTS_PDF_MAX_RSS_MB', 1024)) * 1024 * 1024
+
+# In-memory PDFs reach workers as spool files in RAM-backed /dev/shm (the temp dir where there is none),
+# which the worker memory-maps, rather than as bytes pickled through a pipe and copied again on each side
+SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Finished results the shared extractor keeps in memory for other sessions uploading the same PDF
+SHARED_CACHE_ENTRIES = int(os.environ.get('CTS_SHARED_CACHE_ENTRIES', 256))
+
+def supervised_pool(max_workers=MAX_WORKERS):
+    return SupervisedPool(max_workers, timeout=PDF_TIMEOUT, max_rss_bytes=PDF_MAX_RSS_BYTES)
+
+@contextmanager
+def pdf_buffer(data):
+    """PDF bytes or a buffer as is; a BytesIO-like file (e.g. Streamlit's UploadedFile) as a view of its buffer"""
+    if hasattr(data, 'getbuffer'):
+        with data.getbuffer() as buffer:
+            yield buffer
+    else:
+        yield data
+
+def spool_pdf(data):
+    """Write PDF bytes, a buffer or a BytesIO-like file to a spool file; returns its path"""
+    fd, path = tempfile.mkstemp(prefix='cts-', suffix='.pdf', dir=SPOOL_DIR)
+    with os.fdopen(fd, 'wb') as f, pdf_buffer(data) as buffer:
+        f.write(buffer)
+    return path
+
+def release_spool(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+@contextmanager
+def mapped_pdf(path):
+    """Read-only memory map of a PDF file: hashable and seekable like a file, without reading it into memory"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''  # Empty files can't be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+def process_pdf(filename, data):
+    """Run the full pipeline for one PDF, given its bytes or a path to memory-map it from.
+    Returns a result dict, a dict with an 'error' key if extraction failed, or None if no subjects were found.
+    """
+    timer = start_timer()
+    if isinstance(data, bytes):
+        return _process_pdf(filename, data, timer)
+    try:
+        with mapped_pdf(data) as buf:
+            return _process_pdf(filename, buf, timer)
+    except OSError as e:
+        return {'filename': filename, 'error': f"Error reading file: {e}"}
+
+def _process_pdf(filename, data, timer):
+    with timer.stage('hash'):
+        digest = content_hash(data)
+    with timer.stage('cache lookup'):
+        cached = transcript_cache.get(digest)
+        cached_text = None if cached else transcript_cache.get_text(digest)
+    completed = None
+    if cached:
+        text, complete, completed = cached
+        backend = 'cache'
+    elif cached_text:
+        # Extracted before, parsed under another subjects table: only parsing needs to run again
+        text, complete = cached_text
+        with timer.stage('parse'):
+            completed = reparse(text, complete)
+        if completed is not None:
+            backend = 'cache (reparsed)'
+            with timer.stage('cache store'):
+                transcript_cache.put_completed(digest, completed)
+    if completed is None:
+        try:
+            parser = parse_pdf(data if isinstance(data, mmap.mmap) else io.BytesIO(data), timer=timer)
+        except Exception as e:
+            return {'filename': filename, 'error': f"Error extracting text: {e}"}
+        with timer.stage('parse'):
+            completed = parser.completed()
+        text = parser.text
+        complete = parser.complete
+        backend = parser.backend
+        with timer.stage('cache store'):
+            transcript_cache.put(digest, text, complete, completed)
+    if not text or not completed:
+        return None
+    username = extract_username(text)
+    with timer.stage('analyze'):
+        results = analyze_courses(completed)
+    return {
+        'filename': filename,
+        'hash': digest,
+        'username': username,
+        'completed': completed,
+        'results': results,
+        'text': text,
+        'extraction': {'backend': backend, 'complete': complete},
+        'timings': dict(timer.stages)
+    }
+
+def refresh_result(result):
+    """A result brought up to date with the current catalog: re-parsed from its text where it has that
+    (and the text still suffices, see parsing.reparse), re-analyzed in any case
+    """
+    completed = result['completed']
+    if result.get('text'):
+        reparsed = reparse(result['text'], result.get('extraction', {}).get('complete', True))
+        if reparsed:
+            completed = reparsed
+    return dict(result, completed=completed, results=analyze_courses(completed))
+
+def _logged(result):
+    if result and 'timings' in result:
+        log_timings(result['filename'], result['timings'])
+    return result
+
+def _result(filename, future):
+    """The future's process_pdf result; a killed or crashed worker becomes that file's error"""
+    try:
+        return _logged(future.result())
+    except WorkerError as e:
+        return {'filename': filename, 'error': f"Error extracting text: {e}"}
+
+def _submit(pool, filename, data):
+    """Submit process_pdf for bytes, a buffer, a BytesIO-like file or a path. In-memory data is only spooled
+    when a worker picks the task up, so queued PDFs aren't held in RAM twice, and the spool file is released
+    as soon as the task is done or killed.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        return pool.submit(process_pdf, filename, data)
+    spooled = []
+
+    def spool(filename, data):
+        spooled.append(spool_pdf(data))
+        return filename, spooled[0]
+
+    future = pool.submit(process_pdf, filename, data, prepare=spool)
+    future.add_done_callback(lambda _: spooled and release_spool(spooled[0]))
+    return future
+
+def iter_process_pdfs(files, max_workers=MAX_WORKERS):
+    """Yield process_pdf results for (filename, bytes or path) pairs, in the order given, as soon as each is ready.
+    Even a single file runs in a supervised worker, so a PDF that hangs can't hang the caller.
+    Files are submitted at most one round of workers ahead of the consumer, and in-memory ones spooled only
+    once a worker picks them up, so spool space and memory stay flat however large the batch.
+    """
+    files = iter(files)
+    pending = deque()
+    # Leaving the block (also when the consumer stops early, e.g. a Streamlit rerun) kills whatever is still running
+    with supervised_pool(max(1, max_workers)) as pool:
+        while True:
+            while len(pending) < 2 * max(1, max_workers):
+                item = next(files, None)
+                if item is None:
+                    break
+                filename, data = item
+                pending.append((filename, _submit(pool, filename, data)))
+            if not pending:
+                return
+            filename, future = pending.popleft()
+            yield _result(filename, future)
+
+class SharedExtractor:
+    """One extraction queue and in-memory result cache for a whole server, shared by every session using it.
+    Work is keyed by content hash, so a PDF already extracted or in progress for one session is never extracted
+    again for another; and since there is a single pool, at most max_workers extractions run at once server-wide,
+    with everything else waiting in one FIFO queue. Finished results are kept for the max_entries most recently
+    requested PDFs. Entries are per catalog as well, so an edited catalog file doesn't serve results parsed under the old one.
+    Owners (e.g. each session's Prefetcher) are held weakly, so an abandoned session never pins anything;
+    work all its owners have released is cancelled if it hasn't started yet.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_entries=SHARED_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._pool = supervised_pool(max_workers)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (hash, catalog) -> (future, owners)
+
+    def submit(self, owner, filename, data):
+        """(key, future of process_pdf) for PDF bytes, a buffer or a BytesIO-like file; pass the key to release().
+        A file must stay unchanged until the future is done: it is only read again when a worker picks it up.
+        """
+        with pdf_buffer(data) as buffer:
+            key = content_hash(buffer), current_catalog()
+        with self._lock:
+            entry = self._entries.get(key)
+            # Retry work that was cancelled or whose worker was killed; extraction errors are results like any other
+            if entry is None or entry[0].cancelled() or (entry[0].done() and entry[0].exception()):
+                future = _submit(self._pool, filename, data)
+                entry = self._entries[key] = (future, weakref.WeakSet())
+            self._entries.move_to_end(key)
+            entry[1].add(owner)
+            # Evict the least recently requested finished results; queued and running work always stays
+            finished = [done for done, (future, _) in self._entries.items() if future.done()]
+            overflow = len(self._entries) - self.max_entries
+            for done in finished[:max(0, overflow)]:
+                del self._entries[done]
+        return key, entry[0]
+
+    def release(self, owner, key):
+        """The owner no longer needs this PDF; if no one else does either, it is taken out of the queue"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1].discard(owner)
+            if not entry[1] and entry[0].cancel():
+                del self._entries[key]
+
+    def position(self, future):
+        """Place of a submitted PDF in the server-wide queue, or 0 once it is being extracted or done"""
+        return self._pool.position(future)
+
+    def shutdown(self):
+        self._pool.shutdown()
+        with self._lock:
+            self._entries.clear()
+
+class Prefetcher:
+    """Background process_pdf for files as soon as they are known, e.g. the moment they land in an uploader.
+    Keep one instance across UI reruns and call update() with the current files each time;
+    results() then only waits for whatever is still running.
+    Pass a SharedExtractor to share work and queue with other Prefetchers; by default each has its own.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, extractor=None):
+        self._own_extractor = extractor is None
+        self._extractor = extractor or SharedExtractor(max_workers)
+        self._futures = {}  # file_id -> (filename, extractor key, future)
+
+    def update(self, files):
+        """Sync with {file_id: file} for named BytesIO-like files (e.g. Streamlit's UploadedFile).
+        New files are hashed straight from their buffer and spooled only once a worker is free for them; work for
+        files no longer present is cancelled unless it is already running or someone else is waiting for it.
+        """
+        for file_id in list(self._futures):
+            if file_id not in files:
+                _, key, _ = self._futures.pop(file_id)
+                self._extractor.release(self, key)
+        for file_id, file in files.items():
+            if file_id not in self._futures:
+                key, future = self._extractor.submit(self, file.name, file)
+                self._futures[file_id] = (file.name, key, future)
+
+    @property
+    def ready(self):
+        return sum(future.done() for _, _, future in self._futures.values())
+
+    def __len__(self):
+        return len(self._futures)
+
+    def queue_position(self):
+        """Place of this instance's first queued PDF in the extractor's queue, or 0 if none is waiting"""
+        positions = [self._extractor.position(future) for _, _, future in self._futures.values() if not future.done()]
+        return min(filter(None, positions), default=0)
+
+    def results(self, file_ids, on_wait=None):
+        """Yield process_pdf results for file ids passed to update(), in the order given, as soon as each is ready.
+        While a PDF is still queued, on_wait(position) is called every POLL_SECONDS with its place in the queue.
+        """
+        for file_id in file_ids:
+            filename, _, future = self._futures[file_id]
+            while on_wait and not future.done():
+                position = self._extractor.position(future)
+                if not position:
+                    break
+                on_wait(position)
+                wait([future], timeout=POLL_SECONDS)
+            result = _result(filename, future)
+            # Shared results carry the filename of whoever submitted the PDF first
+            yield dict(result, filename=filename) if result else result
+
+    def shutdown(self):
+        for _, key, _ in self._futures.values():
+            self._extractor.release(self, key)
+        if self._own_extractor:
+            self._extractor.shutdown()
+        self._futures = {}
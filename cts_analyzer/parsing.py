@@ -0,0 +1,291 @@
+"""Turning transcript text into per-subject exam results."""
+import hashlib
+import json
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from enum import StrEnum
+
+from .catalog import current_catalog
+
+# Bump whenever a change to parsing can change its output, so cached results are invalidated
+PARSER_VERSION = 3
+
+def subjects_fingerprint(subjects):
+    """Short hash of everything parsing depends on: PARSER_VERSION and each subject's name and search terms, in order.
+    Courses and validity periods are left out, since results are analyzed and dated afresh on every load.
+    """
+    config = [PARSER_VERSION] + [[name, data["search_terms"]] for name, data in subjects.items()]
+    return hashlib.sha256(json.dumps(config).encode()).hexdigest()[:16]
+
+_fingerprint = (None, None)  # (catalog, its fingerprint)
+
+def parse_fingerprint():
+    """subjects_fingerprint of the current catalog: what cached and stored results are keyed by"""
+    global _fingerprint
+    catalog = current_catalog()
+    if _fingerprint[0] is not catalog:
+        _fingerprint = catalog, subjects_fingerprint(catalog.subjects)
+    return _fingerprint[1]
+
+def clean_text(text):
+    # Fix common OCR errors in dates, e.g., "202 2024" -> "2024"
+    text = re.sub(r'(\d{3})\s+(\d{4})', lambda m: m.group(2) if m.group(2).startswith(m.group(1)) else m.group(0), text)
+    return text
+
+month_pattern = re.compile(r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)', re.I)
+
+date_pattern = re.compile(r'(\d{1,2}\s*-\s*[a-z]{3}\s*-\s*\d{4})|(\d{4}\s*-\s*[a-z]{3}\s*-\s*\d{1,2})|(\d{1,2}/\d{1,2}/\d{4})', re.I)
+
+exam_pattern = re.compile(r'\bexam\b')
+score_pattern = re.compile(r'(\d+)\s*%\s*(pass|fail|complete)?')
+base_month_pattern = re.compile(r'base month\s*[:\s*](\w+)', re.I)
+username_pattern = re.compile(r'(\w+@thc)', re.I)
+
+# How far below an exam line its score may appear, and the window around the score line searched for a date
+SCORE_LOOKAHEAD = 7
+DATE_WINDOW = (-3, 7)
+
+def parse_date(date_str):
+    if not date_str:
+        return None
+    date_str = date_str.replace(' ', '')  # Remove spaces
+    formats = ['%d-%b-%Y', '%Y-%b-%d', '%m/%d/%Y']
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            pass
+    return None
+
+def format_date(date_str):
+    parsed = parse_date(date_str)
+    if parsed:
+        return parsed.strftime('%d %B %Y')
+    return date_str or 'N/A'
+
+class Status(StrEnum):
+    PASS = 'PASS'
+    FAIL = 'FAIL'
+
+class SubjectResult:
+    """One subject's exam result, normalized once at parse time.
+    score is the integer percentage, date the parsed completion date; raw_date keeps the transcript's
+    own string for display when it could not be parsed.
+    """
+    __slots__ = ('status', 'score', 'base_month', 'raw_date', 'date')
+
+    def __init__(self, status, score, base_month, raw_date):
+        self.status = Status(status)
+        self.score = score
+        self.base_month = base_month
+        self.raw_date = raw_date
+        self.date = parse_date(raw_date)
+
+    @property
+    def passed(self):
+        return self.status is Status.PASS
+
+    @property
+    def score_str(self):
+        return f"{self.score}%" if self.score is not None else None
+
+    @property
+    def display_date(self):
+        """Same as format_date(raw_date), without parsing again"""
+        if self.date:
+            return self.date.strftime('%d %B %Y')
+        return self.raw_date or 'N/A'
+
+    def to_dict(self):
+        return {'status': self.status.value, 'score': self.score, 'base_month': self.base_month, 'date': self.raw_date}
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry['status'], entry['score'], entry['base_month'], entry['date'])
+
+    def __eq__(self, other):
+        if not isinstance(other, SubjectResult):
+            return NotImplemented
+        return (self.status, self.score, self.base_month, self.raw_date) == (other.status, other.score, other.base_month, other.raw_date)
+
+    def __repr__(self):
+        return f"SubjectResult({self.status.value!r}, {self.score!r}, {self.base_month!r}, {self.raw_date!r})"
+
+def tag_line(line):
+    """Scan a section line once for everything exam resolution needs: (is_exam, score_match, date)"""
+    line_clean = line.replace('$', '').lower()
+    date_match = date_pattern.search(line)
+    # Cheap substring checks first: most lines have neither an exam nor a score
+    return ('exam' in line_clean and exam_pattern.search(line_clean) is not None,
+            score_pattern.search(line_clean) if '%' in line_clean else None,
+            date_match.group(0) if date_match else None)
+
+def find_exam(tags):
+    """From tagged section lines, find the first exam line with a score within SCORE_LOOKAHEAD lines.
+    Returns (exam line, score line) indexes, or None if no exam has a score.
+    """
+    score_lines = [i for i, (_, score_match, _) in enumerate(tags) if score_match]
+    for i, (is_exam, _, _) in enumerate(tags):
+        if not is_exam:
+            continue
+        k = bisect_left(score_lines, i)
+        if k == len(score_lines):
+            break  # No scores left below this or any later exam line
+        if score_lines[k] - i < SCORE_LOOKAHEAD:
+            return i, score_lines[k]
+    return None
+
+def exam_date(tags, score_line):
+    """Date on the score line, or else the first one in DATE_WINDOW around it"""
+    date = tags[score_line][2]
+    if not date:
+        window = range(max(0, score_line + DATE_WINDOW[0]), min(len(tags), score_line + DATE_WINDOW[1]))
+        date = next((tags[q][2] for q in window if tags[q][2]), None)
+    return date
+
+def resolve_exam(tags):
+    """Returns (Status, score percentage, date string) for a section's tagged lines, or None if no exam has a score"""
+    found = find_exam(tags)
+    if not found:
+        return None
+    score_line = found[1]
+    score_match = tags[score_line][1]
+    score_num = score_match.group(1)
+    status_str = score_match.group(2) or ''
+    score = int(score_num)
+    status = Status.PASS if 'pass' in status_str or 'complete' in status_str or score >= 70 else Status.FAIL
+    return status, score, exam_date(tags, score_line)
+
+class TranscriptParser:
+    """Incremental parse_completed_subjects. Text can be fed in any chunks (e.g. page by page);
+    lines are assigned to subject sections and tagged as they complete, so nothing is rescanned.
+    The whole transcript is matched against the catalog current when parsing started.
+    """
+
+    def __init__(self):
+        self._matcher = current_catalog().matcher
+        self.lines = []
+        self.is_super_condensed = False
+        self._partial = ''
+        self._finished = False
+        self._current_subject = None
+        self._sections = defaultdict(list)
+        self._tags = defaultdict(list)
+
+    @property
+    def has_subjects(self):
+        return bool(self._sections)
+
+    @property
+    def text(self):
+        if self._finished:
+            return '\n'.join(self.lines)
+        return '\n'.join(self.lines + [self._partial])
+
+    def feed(self, chunk):
+        lines = (self._partial + chunk).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line):
+        self.lines.append(line)
+        line_lower = line.lower()
+        if "super condensed report by student" in line_lower:
+            self.is_super_condensed = True
+        self._current_subject = self._matcher.match(line_lower) or self._current_subject
+        if self._current_subject:
+            self._sections[self._current_subject].append(line)
+            self._tags[self._current_subject].append(tag_line(line))
+
+    def finish(self):
+        # Whatever follows the last newline is a line too, same as str.split
+        if not self._finished:
+            self._add_line(self._partial)
+            self._partial = ''
+            self._finished = True
+
+    @property
+    def settled(self):
+        """True once every reachable subject has an exam result that more text can no longer move:
+        score, status and date are final and an explicit base month line has been seen.
+        Super condensed reports fall back to the last date in a section, so they never settle early.
+        """
+        if self.is_super_condensed:
+            return False
+        for subject in self._matcher.reachable:
+            tags = self._tags.get(subject)
+            found = tags and find_exam(tags)
+            if not found:
+                return False
+            exam_line, score_line = found
+            n = len(tags)
+            # An earlier exam line may still get a score from lines not seen yet
+            if any(tags[k][0] for k in range(max(0, n - SCORE_LOOKAHEAD + 1), exam_line)):
+                return False
+            if score_line + DATE_WINDOW[1] > n and not exam_date(tags, score_line):
+                return False
+            # Base month comes from the first explicit match, or else the first 3 section lines; until a match
+            # has been seen, a "base month" line further down would still take precedence
+            if not base_month_pattern.search('\n'.join(self._sections[subject]).lower()):
+                return False
+        return True
+
+    def completed(self):
+        self.finish()
+        completed = {}
+        for subject, section in self._sections.items():
+            section_text = '\n'.join(section).lower()
+            # Base month
+            base_month = None
+            base_match = base_month_pattern.search(section_text)
+            if base_match:
+                base_month = base_match.group(1).capitalize()
+            else:
+                early_text = ' '.join(section[:3]).lower()
+                no_date_early = date_pattern.sub('', early_text)
+                month_match = month_pattern.search(no_date_early)
+                if month_match:
+                    base_month = month_match.group(0).capitalize()
+            # Look for exam score and date
+            exam = resolve_exam(self._tags[subject])
+            if exam:
+                exam_status, exam_score, exam_date_str = exam
+                completed[subject] = SubjectResult(exam_status, exam_score, base_month, exam_date_str)
+            elif self.is_super_condensed:
+                # Fallback for super condensed
+                exam_date_str = None
+                # Find last date in section
+                section_str = '\n'.join(section)
+                dates = [d for group in date_pattern.findall(section_str) for d in group if d]
+                if dates:
+                    exam_date_str = dates[-1]
+                completed[subject] = SubjectResult(Status.PASS, 100, base_month, exam_date_str)
+        return completed
+
+def parse_completed_subjects(text):
+    parser = TranscriptParser()
+    parser.feed(text)
+    return parser.completed()
+
+def reparse(text, complete=True):
+    """parse_completed_subjects for already extracted text, or None when that text can't be trusted any more:
+    parse_pdf stops reading pages once the result is settled, so text that stopped short (complete=False)
+    only stands in for the whole PDF if the current subjects settle on it too.
+    """
+    parser = TranscriptParser()
+    parser.feed(text)
+    if not complete and not parser.settled:
+        return None
+    return parser.completed()
+
+def extract_username(text):
+    # Search near the top: first 10 lines or so
+    lines = text.split('\n')[:10]
+    for line in lines:
+        match = username_pattern.search(line)
+        if match:
+            return match.group(1).split('@')[0]
+    return None
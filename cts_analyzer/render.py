@@ -0,0 +1,455 @@
+"""HTML report and Obsidian markdown rendering for one or more analyzed pilots."""
+import zipfile
+from datetime import datetime, timedelta
+
+from .catalog import current_catalog
+from .expiry import get_expiry_status
+from .views import build_pilot_view, format_date_range, passed_dates, subject_rows
+
+# HTML color spans
+GREEN = '<span style="color:green">'
+RED = '<span style="color:red">'
+YELLOW = '<span style="color:orange">'  # Orange for better visibility than yellow
+RESET = '</span>'
+
+def get_color(status_or_perc):
+    if isinstance(status_or_perc, str):
+        return GREEN if 'PASS' in status_or_perc else RED
+    else:
+        if status_or_perc == 100:
+            return GREEN
+        else:
+            return YELLOW
+
+SUBJECT_TABLE_HEAD = "<table><thead><tr><th>Subject</th><th>Status</th><th>Score</th><th>Base Month</th><th>Date</th><th>Expiry Status</th></tr></thead><tbody>"
+
+def subject_row_html(subject, row):
+    status, score_str, base_str, date_str, badge_html = row
+    return f"<tr><td>{subject}</td><td>{get_color(status)}{status}{RESET}</td><td>{score_str}</td><td>{base_str}</td><td>{date_str}</td><td>{badge_html}</td></tr>"
+
+def generate_table(completed, rows=None):
+    """All-subjects table; pass the view model's rows to skip recomputing expiry badges"""
+    if rows is None:
+        rows = subject_rows(completed)
+    parts = [SUBJECT_TABLE_HEAD]
+    parts.extend(subject_row_html(subject, rows[subject]) for subject in sorted(rows))
+    parts.append("</tbody></table>")
+    return ''.join(parts)
+
+def generate_timings_table(timings):
+    """Per-stage durations for the Performance panel, slowest first"""
+    total = sum(timings.values())
+    output = "<table><thead><tr><th>Stage</th><th>Time (ms)</th><th>Share</th></tr></thead><tbody>"
+    for stage, seconds in sorted(timings.items(), key=lambda x: x[1], reverse=True):
+        share = (seconds / total * 100) if total else 0
+        output += f"<tr><td>{stage}</td><td>{seconds * 1000:.1f}</td><td>{share:.0f}%</td></tr>"
+    output += f"<tr><td><strong>Total</strong></td><td><strong>{total * 1000:.1f}</strong></td><td></td></tr>"
+    output += "</tbody></table>"
+    return output
+
+def generate_expiry_table(entries, index, pdf_results):
+    """Fleet expiry dashboard rows for ExpiryIndex entries, soonest first"""
+    parts = ["<table><thead><tr><th>PDF</th><th>Pilot</th><th>Subject</th><th>Completed</th><th>Expires</th><th>Days Left</th><th>Expiry Status</th></tr></thead><tbody>"]
+    for expiry_date, idx, subject in entries:
+        result = pdf_results[idx]
+        subject_result = result['completed'][subject]
+        badge_html = get_expiry_status(subject, subject_result.date, index.today)[3]
+        parts.append(f"<tr><td>{idx + 1}</td><td>{result['username'] or result['filename']}</td><td>{subject}</td>"
+                     f"<td>{subject_result.display_date}</td><td>{expiry_date.strftime('%d %B %Y')}</td>"
+                     f"<td>{index.days_remaining(expiry_date)}</td><td>{badge_html}</td></tr>")
+    parts.append("</tbody></table>")
+    return ''.join(parts)
+
+def generate_history_table(history):
+    """A pilot's stored transcripts, as returned by TranscriptStore.history"""
+    parts = ["<table><thead><tr><th>Stored</th><th>File</th><th>Passed</th></tr></thead><tbody>"]
+    for stored_at, filename, passed, total in history:
+        stored = datetime.fromisoformat(stored_at).strftime('%d %B %Y %H:%M')
+        parts.append(f"<tr><td>{stored}</td><td>{filename}</td><td>{passed}/{total}</td></tr>")
+    parts.append("</tbody></table>")
+    return ''.join(parts)
+
+def get_date_range(completed):
+    """Get the date range of all completed subjects"""
+    return format_date_range(list(passed_dates(completed).values()))
+
+def generate_course_group_summary(group_name, group_results):
+    """Generate summary for a single course group from its sorted view-model entries"""
+    parts = [f"<h4 style='margin-bottom: 0.5rem;'>{group_name}:</h4><ul style='margin-top: 0.5rem;'>"]
+    
+    for i, (name, adjusted_perc, completed_count, total_count, date_range) in enumerate(group_results):
+        # Calculate raw percentage for coloring
+        raw_perc = (completed_count / total_count * 100) if total_count > 0 else 0
+        color = get_color(raw_perc)
+        count_str = f"({completed_count}/{total_count})"
+        
+        # Create anchor ID for linking
+        anchor_id = name.replace(' ', '_').replace('(', '').replace(')', '')
+        
+        # Check for incomplete/failed subjects
+        missing_count = total_count - completed_count
+        warning_badge = ""
+        if i == 0 and completed_count > 0:  # Most likely course
+            if missing_count > 0:
+                # Has missing or failed subjects
+                warning_badge = f' <span style="background: #ffebee; color: #c62828; padding: 0.2rem 0.6rem; border-radius: 4px; font-size: 0.85rem; font-weight: 600; margin-left: 0.5rem;">⚠️ {missing_count} Missing</span>'
+        
+        # Highlight the most likely (first one after sorting)
+        if i == 0 and completed_count > 0:
+            if missing_count > 0:
+                # Incomplete - show with warning
+                parts.append(f"<li style='margin: 0.5rem 0; padding: 0.75rem; background: #fff3e0; border-left: 4px solid #f57c00; border-radius: 4px;'><strong>⭐ <a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></strong> <span style='background: #fff; color: #f57c00; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.85rem; border: 1px solid #f57c00;'>Most Likely</span>{warning_badge}</li>")
+            else:
+                # Complete - show with success
+                parts.append(f"<li style='margin: 0.5rem 0; padding: 0.75rem; background: #e8f5e9; border-left: 4px solid #4caf50; border-radius: 4px;'><strong>⭐ <a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></strong> <span style='background: #d4edda; color: #155724; padding: 0.2rem 0.5rem; border-radius: 4px; font-size: 0.85rem;'>✓ Complete & Most Likely</span></li>")
+        else:
+            parts.append(f"<li style='margin: 0.5rem 0;'><a href='#{anchor_id}'>{name}</a> <span style='color: #6c757d;'>{count_str}</span></li>")
+    parts.append("</ul>")
+    return ''.join(parts)
+
+def generate_courses(results, completed, today=None):
+    return render_pilot_view(build_pilot_view(results, completed, today))
+
+def render_pilot_view(view):
+    """Full report HTML for one pilot from its view model (see views.build_pilot_view)"""
+    courses = current_catalog().courses
+    start_date, end_date = view['date_range']
+    rows = view['rows']
+    
+    parts = []
+    
+    # Show date range prominently at the top
+    if start_date and end_date:
+        parts.append(f"""
+        <div class="date-banner">
+            <h2 style='margin: 0; color: white;'>📅 Training Period</h2>
+            <p style='margin: 0.5rem 0 0 0; font-size: 1.2rem; font-weight: 500;'>{start_date} — {end_date}</p>
+        </div>
+        """)
+    
+    parts.append("<div class='course-summary'>")
+    parts.append("<h3 style='margin-top: 0;'>🎯 Most Likely Course Lists</h3>")
+    
+    # Display course groups in a more compact way
+    parts.append("<div style='display: flex; gap: 2rem; flex-wrap: wrap;'>")
+    for group_name, group_results in view['groups'].items():
+        parts.append(f"<div style='flex: 1; min-width: 300px;'>{generate_course_group_summary(group_name, group_results)}</div>")
+    parts.append("</div>")
+    
+    parts.append("</div>")
+    
+    parts.append("<br><h3 style='color: #2d3748;'>📋 Detailed Course Breakdowns</h3>")
+    
+    # Show details for each group
+    for group_name, group_results in view['groups'].items():
+        parts.append(f"<h4>{group_name}:</h4>")
+        for name, adjusted_perc, completed_count, total_count, (start_date, end_date) in group_results:
+            if completed_count > 0:
+                # Create anchor for linking
+                anchor_id = name.replace(' ', '_').replace('(', '').replace(')', '')
+                
+                date_info = ""
+                if start_date:
+                    date_info = f"<br><span style='color: #6c757d; font-size: 0.9rem;'>📅 {start_date} — {end_date}</span>"
+                
+                parts.append(f"""
+                <div class='report-card' id='{anchor_id}' style='margin-top: 1rem;'>
+                    <h4 style='margin: 0 0 0.5rem 0; color: #2d3748;'>{name} <span style='color: #6c757d; font-weight: normal;'>({completed_count}/{total_count})</span></h4>
+                    {date_info}
+                </div>
+                """)
+                parts.append(SUBJECT_TABLE_HEAD)
+                for sub in sorted(courses[name]):
+                    if sub in rows:
+                        parts.append(subject_row_html(sub, rows[sub]))
+                    else:
+                        parts.append(f"<tr><td>{sub}</td><td>{RED}Not Completed{RESET}</td><td>N/A</td><td>N/A</td><td>N/A</td><td>N/A</td></tr>")
+                parts.append("</tbody></table>")
+    
+    # Add all subjects at the bottom
+    parts.append("<br><h3 style='color: #2d3748;'>📚 All Subjects Overview</h3>")
+    parts.append("<div class='report-card'>")
+    parts.append(generate_table(None, rows))
+    parts.append("</div>")
+    
+    return ''.join(parts)
+
+def get_next_assignments(selected_courses, completed, base_month):
+    """Determine what should be assigned next based on completed courses"""
+    courses = current_catalog().courses
+    assignments = []
+    warnings = []
+    
+    # Get current date info
+    current_year = datetime.now().year
+    
+    # Determine next base month year (future base month)
+    next_base_year = None
+    if base_month:
+        # Parse base month to get the month number
+        try:
+            month_num = datetime.strptime(base_month, '%B').month
+            # If this month has passed this year, use next year
+            if month_num < datetime.now().month:
+                next_base_year = current_year + 1
+            elif month_num == datetime.now().month:
+                # If it's this month, could be this year or next depending on day
+                next_base_year = current_year + 1  # Default to next year to be safe
+            else:
+                next_base_year = current_year
+        except:
+            next_base_year = current_year + 1
+    
+    # Check P121 progression
+    p121_courses = [c for c in selected_courses if 'P121' in c or c == 'Module 2 (121)']
+    if p121_courses:
+        if 'Initial (P121)' in p121_courses:
+            assignments.append("Module 1 (P121)")
+        elif 'Module 1 (P121)' in p121_courses:
+            assignments.append("Module 2 (121)")
+        elif 'Module 2 (121)' in p121_courses:
+            assignments.append("Module 1 (P121)")
+    
+    # Check P135 progression
+    p135_courses = [c for c in selected_courses if 'P135' in c]
+    if p135_courses:
+        if 'Initial (P135)' in p135_courses:
+            # Determine odd or even year based on next base month
+            if next_base_year:
+                if next_base_year % 2 == 0:
+                    assignments.append("Even Year (P135)")
+                else:
+                    assignments.append("Odd Year (P135)")
+            else:
+                assignments.append("Odd Year (P135) or Even Year (P135) - check base month")
+        
+        elif 'Odd Year (P135)' in p135_courses or 'Even Year (P135)' in p135_courses:
+            # Check if they did it in the right year
+            last_course = 'Odd Year (P135)' if 'Odd Year (P135)' in p135_courses else 'Even Year (P135)'
+            
+            # Get the year when this course was completed
+            dates = []
+            if last_course in courses:
+                for subject in courses[last_course]:
+                    if subject in completed and completed[subject].passed and completed[subject].date:
+                        dates.append(completed[subject].date)
+            
+            if dates:
+                completion_year = max(dates).year
+                course_type = 'odd' if 'Odd' in last_course else 'even'
+                year_type = 'odd' if completion_year % 2 == 1 else 'even'
+                
+                # Check if completed in wrong year
+                if course_type != year_type:
+                    warnings.append(f"⚠️ WARNING: {last_course} was completed in {completion_year} ({year_type} year) - sequence may be incorrect")
+            
+            # Determine next assignment based on next base month
+            if next_base_year:
+                if next_base_year % 2 == 0:
+                    assignments.append("Even Year (P135)")
+                else:
+                    assignments.append("Odd Year (P135)")
+            else:
+                assignments.append("Check next base month for Odd/Even Year (P135)")
+    
+    # Only check DG + SMS if there are selected courses
+    if not selected_courses:
+        return assignments, warnings
+    
+    # Check DG + SMS status
+    dg_completed = False
+    sms_completed = False
+    dg_date = None
+    sms_date = None
+
+    dg_dates = []
+    for subject_name in ["Hazmat", "Dangerous Goods"]:
+        if subject_name in completed and completed[subject_name].passed and completed[subject_name].date:
+            dg_dates.append(completed[subject_name].date)
+    if dg_dates:
+        dg_completed = True
+        dg_date = max(dg_dates)
+
+    sms_dates = []
+    for subject_name in ["SMS"]:
+        if subject_name in completed and completed[subject_name].passed and completed[subject_name].date:
+            sms_dates.append(completed[subject_name].date)
+    if sms_dates:
+        sms_completed = True
+        sms_date = max(sms_dates)
+    
+    # Check if DG + SMS needs to be assigned
+    # Rule: If DG + SMS was written more than 14 months before the upcoming base month, assign it
+    # This ensures it's still valid for the cycle after next
+    needs_dg_sms = False
+    if not dg_completed or not sms_completed:
+        needs_dg_sms = True
+    elif dg_date and sms_date and base_month:
+        most_recent = max(dg_date, sms_date)
+        
+        # Calculate upcoming base month
+        try:
+            month_num = datetime.strptime(base_month, '%B').month
+            current_year = datetime.now().year
+            
+            # Find next occurrence of this base month
+            if month_num < datetime.now().month or (month_num == datetime.now().month and datetime.now().day > 15):
+                upcoming_base_date = datetime(current_year + 1, month_num, 1)
+            else:
+                upcoming_base_date = datetime(current_year, month_num, 1)
+            
+            # Calculate 14 months before upcoming base month
+            fourteen_months_before_base = upcoming_base_date - timedelta(days=425)  # ~14 months
+            
+            # If DG + SMS was written more than 14 months before upcoming base month, assign it
+            if most_recent < fourteen_months_before_base:
+                needs_dg_sms = True
+        except:
+            # Fallback: use simple 12 month rule
+            twelve_months_from_now = datetime.now() + timedelta(days=365)
+            expiry_date = most_recent + timedelta(days=730)
+            if expiry_date < twelve_months_from_now:
+                needs_dg_sms = True
+    elif dg_date and sms_date:
+        # No base month, use simple 12 month rule
+        most_recent = max(dg_date, sms_date)
+        twelve_months_from_now = datetime.now() + timedelta(days=365)
+        expiry_date = most_recent + timedelta(days=730)
+        if expiry_date < twelve_months_from_now:
+            needs_dg_sms = True
+    
+    if needs_dg_sms:
+        assignments.append("DG + SMS")
+    
+    return assignments, warnings
+
+def generate_pilot_markdown(result, selected_courses):
+    """One pilot's section of the Obsidian export, without the trailing separator"""
+    courses = current_catalog().courses
+    parts = []
+    
+    username = result['username'] or 'Unknown User'
+    parts.append(f"## {username}\n\n")
+    
+    # Current Modules
+    if selected_courses:
+        parts.append("**Current Modules:**\n")
+        dates_by_subject = passed_dates(result['completed'])
+        for course in selected_courses:
+            # Get date range for this course
+            dates = []
+            if course in courses:
+                dates = [date for subject, date in dates_by_subject.items() if subject in courses[course]]
+            
+            if dates:
+                start_date, end_date = format_date_range(dates)
+                parts.append(f"- {course} ({start_date} — {end_date})\n")
+            else:
+                parts.append(f"- {course}\n")
+        parts.append("\n")
+    else:
+        parts.append("**Current Modules:** _None selected_\n\n")
+    
+    # Missing/Failed Subjects
+    missing_subjects = []
+    failed_subjects = []
+    
+    for course in selected_courses:
+        if course in courses:
+            for subject in courses[course]:
+                if subject not in result['completed']:
+                    missing_subjects.append(f"{subject} (for {course})")
+                elif not result['completed'][subject].passed:
+                    failed_subjects.append(f"{subject} (for {course})")
+    
+    if missing_subjects or failed_subjects:
+        parts.append("**Missing/Failed Subjects:**\n")
+        for subj in missing_subjects:
+            parts.append(f"- [ ] {subj} - MISSING\n")
+        for subj in failed_subjects:
+            parts.append(f"- [ ] {subj} - FAILED\n")
+        parts.append("\n")
+    else:
+        parts.append("**Status:** ✅ All subjects complete\n\n")
+    
+    # Get base month from completed subjects
+    base_month = None
+    for subject_result in result['completed'].values():
+        if subject_result.base_month:
+            base_month = subject_result.base_month
+            break
+    
+    # Determine next assignments
+    next_assignments, warnings = get_next_assignments(selected_courses, result['completed'], base_month)
+    
+    # Show warnings if any
+    if warnings:
+        parts.append("**⚠️ Warnings:**\n")
+        for warning in warnings:
+            parts.append(f"- {warning}\n")
+        parts.append("\n")
+    
+    # Action items
+    parts.append("**Action Items:**\n")
+    parts.append("- [ ] Updated in CTS\n")
+    parts.append("- [ ] Updated in FleetPlan\n")
+    
+    # Add next assignments including missing subjects
+    if next_assignments or missing_subjects or failed_subjects:
+        parts.append("\n**Next to Assign:**\n")
+        
+        # List each course/module
+        for assignment in next_assignments:
+            parts.append(f"- [ ] {assignment}\n")
+        
+        # Add missing/failed subjects to assign
+        for subj in missing_subjects:
+            subject_name = subj.split(' (for ')[0]
+            parts.append(f"- [ ] {subject_name}\n")
+        for subj in failed_subjects:
+            subject_name = subj.split(' (for ')[0]
+            parts.append(f"- [ ] {subject_name}\n")
+    
+    return ''.join(parts)
+
+def pilot_markdown_sections(pdf_results, manual_selections, cache=None):
+    """Yield (pdf_key, result, markdown section) per pilot.
+    With a cache dict, a pilot's section is only regenerated when its transcript, its selections, the catalog
+    or the date (next assignments depend on it) changed since the last export.
+    """
+    today = datetime.now().date()
+    catalog = current_catalog()
+    for idx, result in enumerate(pdf_results):
+        pdf_key = f"{idx}_{result['username']}"
+        selected_courses = manual_selections.get(pdf_key, [])
+        signature = (result.get('hash'), tuple(selected_courses), today, catalog)
+        cached = cache.get(pdf_key) if cache is not None else None
+        if cached and cached[0] == signature:
+            section = cached[1]
+        else:
+            section = generate_pilot_markdown(result, selected_courses)
+            if cache is not None:
+                cache[pdf_key] = (signature, section)
+        yield pdf_key, result, section
+
+def generate_obsidian_markdown(pdf_results, manual_selections, cache=None):
+    """Generate Obsidian-compatible markdown with checkboxes"""
+    
+    if manual_selections is None or pdf_results is None:
+        return "No data available for export."
+    
+    parts = [
+        "# Training Analysis Report\n\n",
+        f"**Generated:** {datetime.now().strftime('%d %B %Y at %H:%M')}\n\n",
+        "---\n\n"
+    ]
+    for _, _, section in pilot_markdown_sections(pdf_results, manual_selections, cache):
+        parts.append(section)
+        parts.append("\n---\n\n")
+    return ''.join(parts)
+
+def write_obsidian_zip(out, pdf_results, manual_selections, cache=None):
+    """Write one Obsidian note per pilot into a zip archive on the binary file `out`, a note at a time"""
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for idx, (_, result, section) in enumerate(pilot_markdown_sections(pdf_results, manual_selections, cache)):
+            archive.writestr(f"{idx + 1:03d} {result['username'] or 'Unknown User'}.md", section)
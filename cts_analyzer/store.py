@@ -0,0 +1,252 @@
+"""Persistent SQLite training history: every analyzed transcript's results, keyed by username and content hash."""
+import logging
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from .extract import EXTRACTOR_VERSION
+from .fleet import analyze_fleet
+from .ingest import MAX_WORKERS, supervised_pool
+from .parsing import parse_fingerprint, SubjectResult, reparse
+
+logger = logging.getLogger(__name__)
+
+# Set CTS_STORE_PATH to an empty string to turn the store off
+STORE_PATH = os.environ.get('CTS_STORE_PATH', str(Path.home() / '.local' / 'share' / 'cts-analyzer' / 'history.sqlite3'))
+
+# Transcripts re-parsed per round, so a large history never has all of its text in memory at once
+REPARSE_CHUNK = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    hash TEXT PRIMARY KEY,
+    username TEXT,
+    filename TEXT NOT NULL,
+    backend TEXT,
+    stored_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    hash TEXT NOT NULL REFERENCES transcripts(hash) ON DELETE CASCADE,
+    username TEXT,
+    subject TEXT NOT NULL,
+    status TEXT NOT NULL,
+    score INTEGER,
+    base_month TEXT,
+    raw_date TEXT,
+    exam_date TEXT,
+    PRIMARY KEY (hash, subject)
+);
+-- Extracted text, so results can be re-parsed when the subjects table changes
+-- (fingerprint: parse_fingerprint() they were parsed with, extractor: EXTRACTOR_VERSION the text was extracted with)
+CREATE TABLE IF NOT EXISTS texts (
+    hash TEXT PRIMARY KEY REFERENCES transcripts(hash) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    complete INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    extractor INTEGER NOT NULL
+);
+-- Which transcripts each batch stored, so a batch stays whole when a later one re-stores some of them
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES transcripts(hash) ON DELETE CASCADE,
+    PRIMARY KEY (batch, hash)
+);
+CREATE INDEX IF NOT EXISTS transcripts_username ON transcripts(username, stored_at);
+CREATE INDEX IF NOT EXISTS results_username ON results(username);
+CREATE INDEX IF NOT EXISTS results_subject_date ON results(subject, exam_date);
+CREATE INDEX IF NOT EXISTS results_exam_date ON results(exam_date);
+CREATE INDEX IF NOT EXISTS texts_fingerprint ON texts(fingerprint);
+"""
+
+def _iso_day(value):
+    """ISO date string of a date or datetime, as exam_date stores it (a datetime's time of day is dropped)"""
+    return (value.date() if isinstance(value, datetime) else value).isoformat()
+
+def new_batch_id():
+    """Time-ordered and unique per caller, so concurrent sessions and the watch daemon never share a batch"""
+    return f"{datetime.now().isoformat(timespec='microseconds')}-{uuid.uuid4().hex[:8]}"
+
+class TranscriptStore:
+    """process_pdf results in SQLite. Re-storing a transcript (same hash) replaces its rows; every batch keeps
+    the list of transcripts it stored, so a caller can get its own batch back (e.g. after a browser refresh).
+    exam_date is the parsed date in ISO format, so date ranges compare as strings and use the indexes.
+    Each transcript's text is kept too, so reparse() can bring results up to date with a changed subjects table.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._schema_ready = False
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _run(self, action, *args, default=None):
+        """Run action(conn, *args) in a transaction. Failures are logged, never raised,
+        so a locked or read-only store can't break an analysis.
+        """
+        if not self.enabled:
+            return default
+        try:
+            if not self._schema_ready:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with closing(sqlite3.connect(self.path)) as conn, conn:
+                conn.execute('PRAGMA foreign_keys = ON')
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+                return action(conn, *args)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("History store %s unavailable: %s", self.path, e)
+            return default
+
+    def save(self, result, batch):
+        self._run(self._save, result, batch)
+
+    @staticmethod
+    def _save(conn, result, batch):
+        # Upsert rather than delete, which would cascade to the transcript's membership in earlier batches
+        conn.execute(
+            'INSERT INTO transcripts VALUES (?, ?, ?, ?, ?) ON CONFLICT (hash) DO UPDATE SET '
+            'username = excluded.username, filename = excluded.filename, backend = excluded.backend, '
+            'stored_at = excluded.stored_at', (
+                result['hash'], result['username'], result['filename'], result.get('extraction', {}).get('backend'),
+                datetime.now().isoformat(timespec='seconds')
+            ))
+        conn.execute('DELETE FROM results WHERE hash = ?', (result['hash'],))
+        conn.execute('DELETE FROM texts WHERE hash = ?', (result['hash'],))
+        conn.execute('INSERT OR IGNORE INTO batch_items VALUES (?, ?)', (batch, result['hash']))
+        TranscriptStore._insert_results(conn, result['hash'], result['username'], result['completed'])
+        if result.get('text'):
+            conn.execute('INSERT INTO texts VALUES (?, ?, ?, ?, ?)', (
+                result['hash'], result['text'], result['extraction'].get('complete', True), parse_fingerprint(),
+                EXTRACTOR_VERSION
+            ))
+
+    @staticmethod
+    def _insert_results(conn, digest, username, completed):
+        conn.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+            (digest, username, subject, subject_result.status.value, subject_result.score,
+             subject_result.base_month, subject_result.raw_date,
+             subject_result.date.date().isoformat() if subject_result.date else None)
+            for subject, subject_result in completed.items()
+        ])
+
+    @staticmethod
+    def _load(conn, where, params=(), order='rowid'):
+        """Rebuild process_pdf-shaped results for the transcripts matching a WHERE clause, in the order stored.
+        Course results are computed for all of them at once (see fleet.py), since a fleet view loads every pilot.
+        """
+        loaded = []
+        transcripts = conn.execute(f'SELECT hash, username, filename, backend FROM transcripts WHERE {where} ORDER BY {order}', params)
+        for digest, username, filename, backend in transcripts.fetchall():
+            rows = conn.execute('SELECT subject, status, score, base_month, raw_date FROM results WHERE hash = ?', (digest,))
+            completed = {subject: SubjectResult(status, score, base_month, raw_date)
+                         for subject, status, score, base_month, raw_date in rows}
+            loaded.append({
+                'filename': filename,
+                'hash': digest,
+                'username': username,
+                'completed': completed,
+                'extraction': {'backend': backend},
+                'timings': {}
+            })
+        if loaded:
+            fleet = analyze_fleet(result['completed'] for result in loaded)
+            for i, result in enumerate(loaded):
+                result['results'] = fleet.results(i)
+        return loaded
+
+    def reparse(self, max_workers=MAX_WORKERS):
+        """Re-parse, in parallel and from their stored text, the transcripts whose results were parsed under
+        another subjects table (or parser version), and replace those results.
+        Returns (reparsed, left): left ones stopped short of the pages the current subjects need (see parsing.reparse)
+        or were extracted by an older EXTRACTOR_VERSION, and keep their old results until the PDF is analyzed again.
+        Transcripts stored without text are not counted.
+        """
+        stale, outdated = self._run(lambda conn: (
+            [digest for digest, in conn.execute(
+                'SELECT hash FROM texts WHERE fingerprint != ? AND extractor = ?', (parse_fingerprint(), EXTRACTOR_VERSION))],
+            conn.execute('SELECT COUNT(*) FROM texts WHERE fingerprint != ? AND extractor != ?',
+                         (parse_fingerprint(), EXTRACTOR_VERSION)).fetchone()[0]
+        ), default=([], 0))
+        if not stale:
+            return 0, outdated
+        reparsed, left = 0, outdated
+        with supervised_pool(min(max_workers, len(stale))) as pool:
+            for start in range(0, len(stale), REPARSE_CHUNK):
+                chunk = stale[start:start + REPARSE_CHUNK]
+                texts = self._run(lambda conn: conn.execute(
+                    f"SELECT hash, text, complete FROM texts WHERE hash IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall(), default=[])
+                futures = [(digest, pool.submit(reparse, text, bool(complete))) for digest, text, complete in texts]
+                updates = []
+                for digest, future in futures:
+                    try:
+                        completed = future.result()
+                    except Exception as e:
+                        logger.warning("Re-parsing %s failed: %s", digest, e)
+                        left += 1
+                        continue
+                    if completed is None:
+                        left += 1
+                    else:
+                        updates.append((digest, completed))
+                self._run(self._replace_results, updates)
+                reparsed += len(updates)
+        return reparsed, left
+
+    @staticmethod
+    def _replace_results(conn, updates):
+        for digest, completed in updates:
+            row = conn.execute('SELECT username FROM transcripts WHERE hash = ?', (digest,)).fetchone()
+            if row is None:
+                continue  # Deleted meanwhile
+            conn.execute('DELETE FROM results WHERE hash = ?', (digest,))
+            TranscriptStore._insert_results(conn, digest, row[0], completed)
+            conn.execute('UPDATE texts SET fingerprint = ? WHERE hash = ?', (parse_fingerprint(), digest))
+
+    def load_batch(self, batch):
+        """Results of one batch, in the order they were stored, including any re-stored by later batches since"""
+        where = 'hash IN (SELECT hash FROM batch_items WHERE batch = ?)'
+        order = '(SELECT b.rowid FROM batch_items b WHERE b.batch = ? AND b.hash = transcripts.hash)'
+        return self._run(self._load, where, (batch, batch), order, default=[])
+
+    def latest_per_pilot(self):
+        """Most recently stored transcript of every pilot (transcripts without a username count as their own pilot), by username"""
+        latest = ('hash IN (SELECT hash FROM (SELECT hash, ROW_NUMBER() OVER ('
+                  'PARTITION BY COALESCE(username, hash) ORDER BY stored_at DESC, rowid DESC) AS n FROM transcripts) WHERE n = 1)')
+        return self._run(lambda conn: self._load(conn, latest, order='username, rowid'), default=[])
+
+    def hashes(self):
+        """Content hashes of every stored transcript"""
+        return self._run(lambda conn: {digest for digest, in conn.execute('SELECT hash FROM transcripts')}, default=set())
+
+    def history(self, username):
+        """Every stored transcript of one pilot as (stored_at, filename, passed, total) rows, newest first"""
+        if not username:
+            return []
+        return self._run(lambda conn: conn.execute(
+            "SELECT t.stored_at, t.filename, SUM(r.status = 'PASS'), COUNT(r.subject) "
+            "FROM transcripts t JOIN results r ON r.hash = t.hash "
+            "WHERE t.username = ? GROUP BY t.hash ORDER BY t.stored_at DESC", (username,)
+        ).fetchall(), default=[])
+
+    def completed_between(self, start, end, subject=None):
+        """(username, subject, exam date) for results dated start <= date < end, optionally of one subject.
+        start and end are dates or datetimes; only their day counts, like the exam dates they're compared with.
+        """
+        query = 'SELECT username, subject, exam_date FROM results WHERE exam_date >= ? AND exam_date < ?'
+        params = [_iso_day(start), _iso_day(end)]
+        if subject:
+            query += ' AND subject = ?'
+            params.append(subject)
+        return self._run(lambda conn: [
+            (username, subject, datetime.fromisoformat(date))
+            for username, subject, date in conn.execute(query + ' ORDER BY exam_date', params)
+        ], default=[])
+
+history_store = TranscriptStore()
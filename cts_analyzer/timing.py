@@ -0,0 +1,49 @@
+"""Per-file, per-stage pipeline timings, emitted as structured (JSON) log lines.
+
+Set CTS_TIMING=0 to turn timing off; stages then run under a shared no-op context manager.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+TIMING_ENABLED = os.environ.get('CTS_TIMING', '1') != '0'
+
+logger = logging.getLogger('cts_analyzer.timing')
+
+class StageTimer:
+    """Accumulates wall time per named stage; a stage entered twice (e.g. parse per page) adds up"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+class _NullTimer:
+    stages = {}
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+NULL_TIMER = _NullTimer()
+
+def start_timer():
+    return StageTimer() if TIMING_ENABLED else NULL_TIMER
+
+def log_timings(filename, stages, event='pipeline'):
+    if not TIMING_ENABLED or not stages:
+        return
+    logger.info(json.dumps({
+        'event': event,
+        'file': filename,
+        'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()},
+        'total_ms': round(sum(stages.values()) * 1000, 2)
+    }))
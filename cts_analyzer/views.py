@@ -0,0 +1,50 @@
+"""Per-pilot view model: sorted course groups, date ranges and expiry badges, computed once per pilot."""
+from .analysis import ranked_courses
+from .catalog import current_catalog
+from .expiry import get_expiry_status
+
+def format_date_range(dates):
+    """(start, end) as display strings, or (None, None) without dates"""
+    if not dates:
+        return None, None
+    return min(dates).strftime('%d %B %Y'), max(dates).strftime('%d %B %Y')
+
+def passed_dates(completed):
+    """Completion date of every passed subject that has one"""
+    return {subject: result.date for subject, result in completed.items() if result.passed and result.date}
+
+def subject_rows(completed, today=None):
+    """Display row (status, score, base month, date, expiry badge) per completed subject"""
+    rows = {}
+    for subject, result in completed.items():
+        # An unparseable date still counts as present, same as before it was parsed up front
+        badge_html = get_expiry_status(subject, result.date or result.raw_date, today)[3]
+        rows[subject] = (result.status, result.score_str or 'N/A', result.base_month or 'N/A', result.display_date, badge_html)
+    return rows
+
+def build_pilot_view(results, completed, today=None):
+    """Everything the report renders for one pilot, with expiry badges relative to today (default: now).
+    groups maps each course group to (name, adjusted %, completed, total, date range) tuples, most likely first.
+    results must be analyze_courses(completed), whose memoized ranking gives that order.
+    """
+    catalog = current_catalog()
+    dates = passed_dates(completed)
+    groups = {}
+    for group_name, ranking in ranked_courses(completed).items():
+        group_results = []
+        for name in ranking:
+            if name in results:
+                course_dates = [dates[sub] for sub in catalog.courses[name] if sub in dates]
+                group_results.append((
+                    name,
+                    results[name]['completion_percentage'],
+                    results[name]['completed_count'],
+                    results[name]['total_count'],
+                    format_date_range(course_dates)
+                ))
+        groups[group_name] = group_results
+    return {
+        'date_range': format_date_range(list(dates.values())),
+        'groups': groups,
+        'rows': subject_rows(completed, today)
+    }
@@ -0,0 +1,131 @@
+"""Watch-folder daemon: poll a directory and store every new or changed transcript in the history store.
+
+    python -m cts_analyzer.watch /srv/lms-drop --interval 60
+
+Files are tracked by mtime and size between scans and by content hash across restarts, so each transcript
+is extracted once. The app's "Load Fleet View" then shows the latest transcript of every pilot.
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+from .cache import file_hash
+from .cli import find_pdfs
+from .ingest import MAX_WORKERS, iter_process_pdfs
+from .parsing import parse_fingerprint
+from .store import history_store, new_batch_id
+
+logger = logging.getLogger(__name__)
+
+# A file modified more recently than this may still be being copied in; it is picked up on a later scan
+SETTLE_SECONDS = 5
+
+class FolderWatcher:
+    def __init__(self, directory, store=history_store, workers=MAX_WORKERS, settle=SETTLE_SECONDS):
+        self.directory = Path(directory)
+        self.store = store
+        self.workers = workers
+        self.settle = settle
+        self._seen = {}  # path -> (mtime_ns, size) of the version already handled
+        self._known = None  # Content hashes already in the store
+        self._fingerprint = None  # parse_fingerprint() the store was last brought up to date with
+
+    def changed(self):
+        """Settled PDFs that are new or changed since they were last handled, with their (mtime_ns, size)"""
+        now = time.time()
+        found = {}
+        for path in find_pdfs([str(self.directory)]):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed between listing and stat
+            found[path] = (stat.st_mtime_ns, stat.st_size)
+        # Forget deleted files, so one dropped again under the same name is picked up
+        for path in set(self._seen) - set(found):
+            del self._seen[path]
+        return [(path, version) for path, version in found.items()
+                if self._seen.get(path) != version and now - version[0] / 1e9 >= self.settle]
+
+    def scan(self):
+        """Process everything new or changed once. Returns (stored, unchanged, skipped, failed) counts."""
+        if self._known is None:
+            self._known = self.store.hashes()
+        files = []
+        unchanged = 0
+        for path, version in self.changed():
+            try:
+                digest = file_hash(path)
+            except OSError as e:
+                logger.warning("%s: %s", path, e)
+                continue
+            self._seen[path] = version
+            if digest in self._known:
+                unchanged += 1  # Touched or copied again, same content
+                continue
+            # Workers map the file themselves, so no PDF is held in the daemon's memory
+            files.append((str(path), path))
+
+        stored = skipped = failed = 0
+        batch = new_batch_id()
+        for (filename, _), result in zip(files, iter_process_pdfs(files, self.workers)):
+            if result is None:
+                skipped += 1
+                logger.info("%s: no subjects detected", filename)
+            elif 'error' in result:
+                failed += 1
+                logger.warning("%s: %s", filename, result['error'])
+            else:
+                stored += 1
+                self.store.save(result, batch)
+                self._known.add(result['hash'])
+                logger.info("%s: stored %s", filename, result['username'] or 'unknown user')
+        return stored, unchanged, skipped, failed
+
+    def reparse(self):
+        """Bring stored results up to date with the subjects table, if it changed since the last call"""
+        fingerprint = parse_fingerprint()
+        if fingerprint == self._fingerprint:
+            return
+        reparsed, left = self.store.reparse(self.workers)
+        if reparsed or left:
+            logger.info("Re-parsed %d stored transcripts for the current subjects table; %d need their PDF analyzed again", reparsed, left)
+        self._fingerprint = fingerprint
+
+    def run(self, interval, once=False):
+        while True:
+            # Before each scan, so an edited catalog file is picked up without restarting the daemon
+            self.reparse()
+            stored, unchanged, skipped, failed = self.scan()
+            if stored or skipped or failed:
+                logger.info("Scan: %d stored, %d unchanged, %d without subjects, %d failed", stored, unchanged, skipped, failed)
+            if once:
+                return
+            time.sleep(interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cts_analyzer.watch', description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help="Folder to watch (searched recursively)")
+    parser.add_argument('--interval', type=float, default=30, help="Seconds between scans (default: 30)")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS, help=f"Minimum file age in seconds before it is read (default: {SETTLE_SECONDS})")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help=f"Worker processes (default: {MAX_WORKERS})")
+    parser.add_argument('--once', action='store_true', help="Scan once and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if not history_store.enabled:
+        print("The history store is disabled (CTS_STORE_PATH is empty); there is nowhere to put results.", file=sys.stderr)
+        return 1
+    if not Path(args.directory).is_dir():
+        print(f"{args.directory} is not a directory.", file=sys.stderr)
+        return 1
+    logger.info("Watching %s, storing to %s", args.directory, history_store.path)
+    try:
+        FolderWatcher(args.directory, workers=args.workers, settle=args.settle).run(args.interval, args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
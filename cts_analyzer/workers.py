@@ -0,0 +1,215 @@
+"""Supervised worker processes: per-task wall-clock timeout, RSS cap and crash isolation.
+
+A ProcessPoolExecutor can't stop a single stuck task, and one worker dying breaks the whole pool.
+Here a supervisor thread watches every worker; one that runs too long, grows past the memory cap or
+dies is killed and replaced, and only its own task fails (with WorkerError). Everything else keeps going.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# Workers are started from a clean server process (or spawned where there is none), never forked from the caller:
+# a fork of a multi-threaded process such as the Streamlit server can inherit a lock another thread held, e.g.
+# logging's, and hang on it, which the supervisor would then blame on the task
+_context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# How often busy workers are checked for timeouts and memory, and how long an idle pool keeps its processes
+POLL_SECONDS = 0.1
+IDLE_SECONDS = 60
+
+class WorkerError(Exception):
+    """The task's worker was killed (timeout, memory) or died; the message says which"""
+
+def rss_bytes(pid):
+    """Resident set size of a process, or None where /proc isn't available (the memory cap is then not enforced)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _worker_main(conn):
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        fn, args = task
+        try:
+            outcome = (True, fn(*args))
+        except Exception as e:
+            outcome = (False, e)
+        try:
+            conn.send(outcome)
+        except Exception as e:
+            # Unpicklable result or exception
+            conn.send((False, WorkerError(f"Could not return result: {e}")))
+
+class _Worker:
+    def __init__(self):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.future = None
+        self.started = None
+
+    def start(self, future, fn, args):
+        self.future = future
+        self.started = time.monotonic()
+        self.conn.send((fn, args))
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SupervisedPool:
+    """Process pool with a Future-based submit(), like concurrent.futures, but supervised per task.
+    timeout is wall-clock seconds per task, max_rss_bytes the cap on a worker's resident memory (0 for no limit).
+    """
+
+    def __init__(self, max_workers, timeout=0, max_rss_bytes=0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_bytes
+        self._pending = deque()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._wakeup, self._wake = multiprocessing.Pipe(duplex=False)
+        self._woken = False  # A wakeup is already in the pipe; at most one is, so submit() can never block on it
+        self._thread = None
+        self._shutdown = False
+
+    def submit(self, fn, *args, prepare=None):
+        """Future of fn(*args) in a worker. prepare, if given, is called as prepare(*args) when a worker picks
+        the task up and returns the args actually sent (e.g. to write a large input out only then); if it raises,
+        the task fails with that exception. It runs on the supervisor thread, so keep it short.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            self._pending.append((future, fn, args, prepare))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._supervise, name='cts-worker-supervisor', daemon=True)
+                self._thread.start()
+            if not self._woken:
+                self._woken = True
+                self._wake.send(None)
+        return future
+
+    def position(self, future):
+        """1-based place of a submitted task in the queue, or 0 once it is running or done"""
+        with self._lock:
+            for place, (pending, *_) in enumerate(self._pending, start=1):
+                if pending is future:
+                    return place
+        return 0
+
+    def shutdown(self):
+        """Cancel queued tasks and kill the workers; tasks still running fail with WorkerError"""
+        with self._lock:
+            self._shutdown = True
+            while self._pending:
+                self._pending.popleft()[0].cancel()
+            for worker in self._workers:
+                worker.stop()
+                if worker.future:
+                    worker.future.set_exception(WorkerError("Pool shut down"))
+            self._workers = []
+            if not self._woken:
+                self._woken = True
+                self._wake.send(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _dispatch(self):
+        while self._pending:
+            worker = next((w for w in self._workers if w.future is None), None)
+            if worker is None:
+                if len(self._workers) >= self.max_workers:
+                    return
+                worker = _Worker()
+                self._workers.append(worker)
+            future, fn, args, prepare = self._pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if prepare:
+                try:
+                    args = prepare(*args)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+            worker.start(future, fn, args)
+
+    def _fail(self, worker, message):
+        worker.stop()
+        self._workers.remove(worker)
+        worker.future.set_exception(WorkerError(message))
+
+    def _check(self, worker, now):
+        if worker.conn.poll():
+            try:
+                ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                self._fail(worker, f"Worker crashed (exit code {worker.process.exitcode})")
+                return
+            future, worker.future = worker.future, None
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            # Python rarely hands memory back; retire a worker a big task left bloated before it hits the cap on a small one
+            rss = self.max_rss_bytes and rss_bytes(worker.process.pid)
+            if rss and rss > self.max_rss_bytes / 2:
+                worker.stop()
+                self._workers.remove(worker)
+        elif not worker.process.is_alive():
+            self._fail(worker, f"Worker crashed (exit code {worker.process.exitcode})")
+        elif self.timeout and now - worker.started > self.timeout:
+            self._fail(worker, f"Timed out after {self.timeout:g}s")
+        elif self.max_rss_bytes:
+            rss = rss_bytes(worker.process.pid)
+            if rss and rss > self.max_rss_bytes:
+                self._fail(worker, f"Exceeded the {self.max_rss_bytes // (1024 * 1024)} MB memory limit")
+
+    def _supervise(self):
+        idle_since = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self._shutdown:
+                    self._thread = None
+                    return
+                self._woken = False
+                self._dispatch()
+                busy = [w for w in self._workers if w.future]
+                if busy or self._pending:
+                    idle_since = now
+                elif now - idle_since > IDLE_SECONDS:
+                    # Nothing to do for a while: release the processes (and this thread) until the next submit
+                    for worker in self._workers:
+                        worker.stop()
+                    self._workers = []
+                    self._thread = None
+                    return
+            try:
+                wait([self._wakeup] + [w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=POLL_SECONDS)
+            except (OSError, ValueError):
+                pass  # A worker was stopped by shutdown() meanwhile; the next round sees it
+            while self._wakeup.poll():
+                self._wakeup.recv()
+            with self._lock:
+                now = time.monotonic()
+                for worker in busy:
+                    if worker.future and worker in self._workers:
+                        self._check(worker, now)
@@ -0,0 +1,54 @@
+"""Pass-set memo behind analyze_courses, ranked_courses and most_likely_courses."""
+import random
+
+import pytest
+
+from cts_analyzer.analysis import analyze_courses, most_likely_courses, ranked_courses, score_cache_info
+from cts_analyzer.catalog import current_catalog
+from cts_analyzer.parsing import SubjectResult
+
+def random_completed(rng):
+    subjects = list(current_catalog().subjects) + ['Not In Catalog']
+    return {subject: SubjectResult(rng.choice(['PASS', 'PASS', 'FAIL']), rng.randint(40, 100), None, '1-Mar-2024')
+            for subject in rng.sample(subjects, rng.randint(0, len(subjects)))}
+
+def naive_most_likely(results):
+    """most_likely_courses as it was: every group sorted per pilot"""
+    likely = {}
+    for group_name, course_list in current_catalog().course_groups.items():
+        ranked = sorted((name for name in course_list if name in results),
+                        key=lambda name: results[name]['completion_percentage'], reverse=True)
+        likely[group_name] = ranked[0] if ranked and results[ranked[0]]['completed_count'] > 0 else None
+    return likely
+
+def test_ranking_matches_percentages():
+    rng = random.Random(25)
+    for _ in range(500):
+        completed = random_completed(rng)
+        results = analyze_courses(completed)
+        assert most_likely_courses(completed) == naive_most_likely(results)
+        for group_name, course_list in current_catalog().course_groups.items():
+            ranking = ranked_courses(completed)[group_name]
+            assert sorted(ranking) == sorted(name for name in course_list if name in results)
+            percentages = [results[name]['completion_percentage'] for name in ranking]
+            assert percentages == sorted(percentages, reverse=True)
+
+def test_memo_entries_not_shared():
+    completed = random_completed(random.Random(1))
+    analyze_courses(completed)['CRM Only'] = None
+    next(iter(analyze_courses(completed).values()))['completion_percentage'] = -1
+    results = analyze_courses(completed)
+    assert 'CRM Only' not in results and all(scores['completion_percentage'] >= 0 for scores in results.values())
+    with pytest.raises(TypeError):
+        ranked_courses(completed)['new group'] = ()
+
+def test_hit_rate_counts_analyze_courses_only():
+    before = score_cache_info()
+    completed = {'Only In This Test': SubjectResult('PASS', 99, None, None), 'CRM': SubjectResult('PASS', 91, None, None)}
+    analyze_courses(completed)
+    ranked_courses(completed)
+    most_likely_courses(completed)
+    analyze_courses(dict(completed))  # Same pass-set, another pilot
+    after = score_cache_info()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
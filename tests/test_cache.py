@@ -0,0 +1,52 @@
+"""TranscriptCache keys and eviction, against a throwaway directory."""
+import pytest
+
+from cts_analyzer import cache
+from cts_analyzer.cache import TranscriptCache
+from cts_analyzer.parsing import SubjectResult
+
+COMPLETED = {'CRM': SubjectResult('PASS', 90, 'March', '1-Mar-2024')}
+
+@pytest.fixture
+def transcript_cache(tmp_path):
+    return TranscriptCache(tmp_path, max_bytes=10 * 1024 * 1024)
+
+def test_round_trip(transcript_cache):
+    transcript_cache.put('abc', 'some text', False, COMPLETED)
+    assert transcript_cache.get_text('abc') == ('some text', False)
+    assert transcript_cache.get('abc') == ('some text', False, COMPLETED)
+    assert transcript_cache.get('other') is None
+
+def test_text_keyed_by_extractor_version(transcript_cache, monkeypatch):
+    transcript_cache.put('abc', 'some text', True, COMPLETED)
+    monkeypatch.setattr(cache, 'EXTRACTOR_VERSION', cache.EXTRACTOR_VERSION + 1)
+    # Text from an older extractor is neither re-parsed nor served with its results
+    assert transcript_cache.get_text('abc') is None
+    assert transcript_cache.get('abc') is None
+
+def test_results_keyed_by_parse_fingerprint(transcript_cache, monkeypatch):
+    transcript_cache.put('abc', 'some text', True, COMPLETED)
+    monkeypatch.setattr(cache, 'parse_fingerprint', lambda: 'another')
+    assert transcript_cache.get('abc') is None
+    assert transcript_cache.get_text('abc') == ('some text', True)
+
+def test_evicts_least_recently_used(tmp_path):
+    transcript_cache = TranscriptCache(tmp_path, max_bytes=4000)
+    for i in range(20):
+        transcript_cache.put(f'{i:03d}', 'x' * 300, True, COMPLETED)
+        if i >= 1:
+            transcript_cache.get('001')  # Kept in use throughout
+    assert sum(path.stat().st_size for path in tmp_path.glob('*.json')) <= 4000
+    assert transcript_cache.get('001') is not None
+    assert transcript_cache.get('019') is not None
+    assert transcript_cache.get('000') is None
+
+def test_scans_directory_only_when_needed(tmp_path, monkeypatch):
+    transcript_cache = TranscriptCache(tmp_path, max_bytes=10 * 1024 * 1024)
+    scans = []
+    evict = transcript_cache.evict
+    monkeypatch.setattr(transcript_cache, 'evict', lambda: scans.append(1) or evict())
+    for i in range(cache.EVICT_SCAN_WRITES):
+        transcript_cache.put(f'{i:03d}', 'text', True, COMPLETED)
+    # put() writes twice: the first write scans to learn the size, after that only every EVICT_SCAN_WRITES writes
+    assert len(scans) == 2
@@ -0,0 +1,42 @@
+"""parse_pdf may stop reading pages once the result is settled, but never with a different result than reading them all."""
+import io
+
+import pytest
+
+from cts_analyzer.bench import write_pdf
+from cts_analyzer.catalog import current_catalog
+from cts_analyzer.extract import extract_text_from_pdf, parse_pdf
+from cts_analyzer.parsing import parse_completed_subjects
+
+pytest.importorskip('pdfminer')
+
+def transcript_pages(base_month_lines, trailer):
+    """Every reachable subject with an exam result on the first page(s), then filler pages, then `trailer`"""
+    catalog = current_catalog()
+    lines = ["Training Transcript", "Username: pilot7@thc"]
+    for i, subject in enumerate(name for name in catalog.subjects if name in catalog.matcher.reachable):
+        terms = catalog.subjects[subject]["search_terms"]
+        lines.append(f"{terms[0].strip()} Overview")
+        if base_month_lines:
+            lines.append("Base Month March")
+        lines += [f"{terms[-1]} - Exam", f"{70 + i % 30}% Pass {1 + i % 28}-Mar-2024", "Lesson 1 - Completed"]
+    lines += [f"Lesson {j} - Completed" for j in range(200)] + trailer
+    return [lines[i:i + 45] for i in range(0, len(lines), 45)]
+
+def full_parse(pdf, backend):
+    return parse_completed_subjects(extract_text_from_pdf(io.BytesIO(pdf), backend))
+
+def test_late_base_month_line_is_read():
+    # Without explicit base month lines a later one could still win, so every page must be read
+    pdf = write_pdf(transcript_pages(base_month_lines=False, trailer=["Base Month June"]))
+    parser = parse_pdf(io.BytesIO(pdf))
+    assert parser.complete
+    completed = parser.completed()
+    assert completed == full_parse(pdf, parser.backend)
+    assert 'June' in {result.base_month for result in completed.values()}
+
+def test_settled_transcript_stops_early():
+    pdf = write_pdf(transcript_pages(base_month_lines=True, trailer=["Base Month June"]))
+    parser = parse_pdf(io.BytesIO(pdf))
+    assert not parser.complete
+    assert parser.completed() == full_parse(pdf, parser.backend)
@@ -0,0 +1,40 @@
+"""FleetAnalysis must give exactly the per-pilot analyze_courses results, values and types alike."""
+import random
+
+import pytest
+
+from cts_analyzer.analysis import analyze_courses
+from cts_analyzer.catalog import current_catalog
+from cts_analyzer.parsing import SubjectResult
+
+pytest.importorskip('numpy')
+
+from cts_analyzer.fleet import analyze_fleet
+
+def random_fleet(count, seed=12):
+    rng = random.Random(seed)
+    subjects = list(current_catalog().subjects) + ['Not In Catalog', 'Also Not In Catalog']
+    fleet = []
+    for _ in range(count):
+        # Whole courses passed (100% before the penalty) as well as random subsets
+        picked = rng.sample(subjects, rng.randint(0, len(subjects)))
+        if rng.random() < 0.3:
+            picked = list(rng.choice(list(current_catalog().courses.values()))) + picked[:rng.randint(0, 10)]
+        fleet.append({subject: SubjectResult(rng.choice(['PASS', 'PASS', 'FAIL']), rng.randint(40, 100), None, None)
+                      for subject in picked})
+    return fleet
+
+def test_matches_analyze_courses():
+    fleet = random_fleet(3000)
+    analysis = analyze_fleet(fleet)
+    assert len(analysis) == len(fleet)
+    for i, completed in enumerate(fleet):
+        expected = analyze_courses(completed)
+        results = analysis.results(i)
+        assert results == expected
+        for course_name, scores in expected.items():
+            for key, value in scores.items():
+                assert type(results[course_name][key]) is type(value), (course_name, key)
+
+def test_empty_fleet():
+    assert len(analyze_fleet([])) == 0
@@ -0,0 +1,69 @@
+"""SubjectMatcher must pick exactly the subject the original per-subject, per-term scan picked."""
+import random
+
+import pytest
+
+from cts_analyzer.catalog import SubjectMatcher, current_catalog
+
+FILLER = ["Enrolled", "Completed", "Exam", "Overview", "- RW", "(P135)", "Score: 85%", "12-Mar-2024", "RW", "and", "of"]
+
+def naive_match(subjects, line):
+    """The scan SubjectMatcher replaced: first subject in catalog order with any term in the line"""
+    line_lower = line.lower()
+    for name, data in subjects.items():
+        for term in data["search_terms"]:
+            if term.lower() in line_lower:
+                return name
+    return None
+
+def vary_case(rng, text):
+    return ''.join(ch.upper() if rng.random() < 0.3 else ch.lower() if rng.random() < 0.3 else ch for ch in text)
+
+def generated_lines(subjects, count, seed=0):
+    rng = random.Random(seed)
+    terms = [term for data in subjects.values() for term in data["search_terms"]]
+    for _ in range(count):
+        parts = rng.sample(FILLER, rng.randint(0, 3))
+        for _ in range(rng.randint(0, 3)):
+            term = rng.choice(terms)
+            if rng.random() < 0.3:
+                # Partial terms and terms run into their neighbours
+                start = rng.randrange(len(term))
+                term = term[start:start + rng.randint(1, len(term))]
+            parts.insert(rng.randint(0, len(parts)), term)
+        sep = rng.choice([' ', '', ' - '])
+        yield vary_case(rng, sep.join(parts))
+
+@pytest.fixture(scope='module')
+def subjects():
+    return current_catalog().subjects
+
+def test_matches_naive_scan(subjects):
+    matcher = SubjectMatcher(subjects)
+    for line in generated_lines(subjects, 20000):
+        assert matcher.match(line.lower()) == naive_match(subjects, line), line
+
+def test_every_term_on_its_own(subjects):
+    matcher = SubjectMatcher(subjects)
+    for data in subjects.values():
+        for term in data["search_terms"]:
+            for line in (term, term.upper(), f"xx {term.lower()} yy"):
+                assert matcher.match(line.lower()) == naive_match(subjects, line), line
+
+def test_shadowed_subject(subjects):
+    matcher = SubjectMatcher(subjects)
+    # Every CFIT (P135) term is also a CFIT term, and CFIT is listed first
+    line = "Controlled Flight into Terrain Avoidance RW Exam"
+    assert matcher.match(line.lower()) == naive_match(subjects, line) == "CFIT"
+    assert "CFIT (P135)" not in matcher.reachable
+    assert "CFIT" in matcher.reachable
+
+def test_priority_not_position():
+    subjects = {
+        "First": {"search_terms": ["late term"], "courses": []},
+        "Second": {"search_terms": ["early"], "courses": []},
+    }
+    matcher = SubjectMatcher(subjects)
+    line = "early words then a late term"
+    assert matcher.match(line) == naive_match(subjects, line) == "First"
+    assert matcher.match("nothing here") is None
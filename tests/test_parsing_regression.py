@@ -0,0 +1,137 @@
+"""parse_completed_subjects must resolve the same exam results as the resolver it replaced (frozen below)."""
+import random
+import re
+from collections import defaultdict
+
+import pytest
+
+from cts_analyzer.bench import LAYOUTS, synthetic_transcript
+from cts_analyzer.catalog import current_catalog
+from cts_analyzer.parsing import clean_text, parse_completed_subjects
+
+month_pattern = re.compile(r'(january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)', re.I)
+
+date_pattern = re.compile(r'(\d{1,2}\s*-\s*[a-z]{3}\s*-\s*\d{4})|(\d{4}\s*-\s*[a-z]{3}\s*-\s*\d{1,2})|(\d{1,2}/\d{1,2}/\d{4})', re.I)
+
+# The old resolver printed scores as found ('07%'); the new one keeps the integer
+LEADING_ZERO_SCORE = re.compile(r'(?<!\d)0\d+\s*%')
+
+def old_parse_completed_subjects(text, subjects):
+    """parse_completed_subjects as it was before the single-pass parser, verbatim apart from taking subjects"""
+    text_lower = text.lower()
+    is_super_condensed = "super condensed report by student" in text_lower
+    lines = text.split('\n')
+    subjects_sections = defaultdict(list)
+    current_subject = None
+    for line in lines:
+        line_lower = line.lower()
+        found = False
+        for sub, data in subjects.items():
+            for term in data["search_terms"]:
+                if term.lower() in line_lower:
+                    current_subject = sub
+                    found = True
+                    break
+            if found:
+                break
+        if current_subject:
+            subjects_sections[current_subject].append(line)
+    completed = {}
+    for subject, section in subjects_sections.items():
+        section_text = '\n'.join(section).lower()
+        base_month = None
+        base_match = re.search(r'base month\s*[:\s*](\w+)', section_text, re.I)
+        if base_match:
+            base_month = base_match.group(1).capitalize()
+        else:
+            early_text = ' '.join(section[:3]).lower()
+            no_date_early = date_pattern.sub('', early_text)
+            month_match = month_pattern.search(no_date_early)
+            if month_match:
+                base_month = month_match.group(0).capitalize()
+        exam_status = 'PASS'
+        exam_score = None
+        exam_date = None
+        found_exam = False
+        for i, line in enumerate(section):
+            line_clean = line.replace('$', '').lower()
+            if re.search(r'\bexam\b', line_clean):
+                found_exam = True
+                score_found = False
+                for m in range(0, 7):
+                    if i + m < len(section):
+                        sub_line = section[i + m]
+                        sub_line_clean = sub_line.replace('$', '').lower()
+                        score_match = re.search(r'(\d+)\s*%\s*(pass|fail|complete)?', sub_line_clean)
+                        if score_match:
+                            score_num = score_match.group(1)
+                            exam_score = score_num + '%'
+                            status_str = score_match.group(2) or ''
+                            exam_status = 'PASS' if 'pass' in status_str.lower() or 'complete' in status_str.lower() or int(score_num) >= 70 else 'FAIL'
+                            score_found = True
+                            date_match = date_pattern.search(sub_line)
+                            if date_match:
+                                exam_date = date_match.group(0)
+                            else:
+                                for p in range(-3, 7):
+                                    q = i + m + p
+                                    if 0 <= q < len(section):
+                                        date_match = date_pattern.search(section[q])
+                                        if date_match:
+                                            exam_date = date_match.group(0)
+                                            break
+                            break
+                if score_found:
+                    break
+        if found_exam and exam_score:
+            completed[subject] = (exam_status, exam_score, base_month, exam_date)
+        elif is_super_condensed:
+            exam_status = 'PASS'
+            exam_score = '100%'
+            section_str = '\n'.join(section)
+            dates = [d for group in date_pattern.findall(section_str) for d in group if d]
+            if dates:
+                exam_date = dates[-1]
+            completed[subject] = (exam_status, exam_score, base_month, exam_date)
+    return completed
+
+def as_tuples(completed):
+    return {subject: (result.status.value, f"{result.score}%", result.base_month, result.raw_date)
+            for subject, result in completed.items()}
+
+def windowed_transcript(rng):
+    """Exam blocks that put the score and date at the edges of (and just past) the old search windows"""
+    subjects = current_catalog().subjects
+    lines = ["Training Transcript", "Username: pilot1@thc"]
+    for subject in rng.sample(list(subjects), 6):
+        terms = subjects[subject]["search_terms"]
+        block = [terms[0], f"Base Month: {rng.choice(['Jan', 'March', 'Sep'])}" if rng.random() < 0.5 else "Lessons"]
+        before = [f"Completed {rng.randint(1, 28)}-Feb-2023" if rng.random() < 0.4 else "Lesson"
+                  for _ in range(rng.randint(0, 4))]
+        block += before
+        block.append(rng.choice([f"{terms[-1]} - Exam", f"$Exam {terms[-1]}", "Examination notes", "EXAM"]))
+        block += ["Attempt"] * rng.randint(0, 8)
+        score = rng.randint(10, 100)
+        status = rng.choice(['Pass', 'Fail', 'Complete', ''])
+        date = rng.choice([f"{rng.randint(1, 28)}-Mar-2024", f"2024-Apr-{rng.randint(1, 28)}", "3/14/2024", ""])
+        block.append(f"{score} $% {status} {date}" if rng.random() < 0.2 else f"{score}% {status} {date}")
+        block += [rng.choice(["Lesson", f"{rng.randint(1, 28)}-Jun-2024", "Signed"]) for _ in range(rng.randint(0, 7))]
+        lines += block
+    return '\n'.join(lines)
+
+def corpus():
+    rng = random.Random(4)
+    for layout in LAYOUTS:
+        for noise in (0.0, 0.05, 0.3):
+            for _ in range(40):
+                pages = synthetic_transcript(rng, layout, n_subjects=rng.randint(1, 20), n_pages=rng.randint(1, 4), noise=noise)
+                yield clean_text('\n'.join(line for page in pages for line in page))
+    for _ in range(200):
+        yield windowed_transcript(rng)
+
+@pytest.mark.parametrize('index,text', [
+    (index, text) for index, text in enumerate(corpus()) if not LEADING_ZERO_SCORE.search(text)
+])
+def test_matches_old_resolver(index, text):
+    subjects = current_catalog().subjects
+    assert as_tuples(parse_completed_subjects(text)) == old_parse_completed_subjects(text, subjects)
@@ -0,0 +1,81 @@
+"""TranscriptStore queries against a throwaway SQLite file."""
+from datetime import date, datetime
+
+import pytest
+
+from cts_analyzer.parsing import SubjectResult
+from cts_analyzer.store import TranscriptStore, new_batch_id
+
+def stored(digest, username, completed):
+    return {'hash': digest, 'username': username, 'filename': f'{digest}.pdf',
+            'completed': {subject: SubjectResult(*row) for subject, row in completed.items()},
+            'extraction': {'backend': 'test'}}
+
+@pytest.fixture
+def store(tmp_path):
+    store = TranscriptStore(str(tmp_path / 'history.sqlite3'))
+    batch = new_batch_id()
+    store.save(stored('a', 'pilot1', {
+        'CRM': ('PASS', 90, 'March', '1-Mar-2024'),
+        'SMS': ('PASS', 80, 'March', '15-Mar-2024'),
+        'Hazmat': ('FAIL', 50, 'March', '1-Apr-2024'),
+    }), batch)
+    store.save(stored('b', 'pilot2', {
+        'CRM': ('PASS', 75, None, '29-Feb-2024'),
+        'Weather': ('PASS', 100, None, None),
+    }), batch)
+    return store
+
+def test_completed_between_includes_start_day(store):
+    # A datetime bound later in the day than midnight still covers results dated on that day
+    rows = store.completed_between(datetime(2024, 3, 1, 14, 30), datetime(2024, 4, 1, 9, 0))
+    assert rows == [('pilot1', 'CRM', datetime(2024, 3, 1)), ('pilot1', 'SMS', datetime(2024, 3, 15))]
+
+def test_completed_between_dates_and_subject(store):
+    assert store.completed_between(date(2024, 2, 1), date(2024, 3, 2), subject='CRM') == [
+        ('pilot2', 'CRM', datetime(2024, 2, 29)), ('pilot1', 'CRM', datetime(2024, 3, 1))]
+    assert store.completed_between(date(2024, 4, 1), date(2024, 4, 2)) == [('pilot1', 'Hazmat', datetime(2024, 4, 1))]
+    assert store.completed_between(date(2025, 1, 1), date(2026, 1, 1)) == []
+
+def test_date_indexes_used(store):
+    plans = store._run(lambda conn: [
+        ' '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN SELECT username FROM results WHERE {where}', params))
+        for where, params in (("exam_date >= ? AND exam_date < ?", ('2024-01-01', '2025-01-01')),
+                              ("subject = ? AND exam_date >= ?", ('CRM', '2024-01-01')))
+    ])
+    assert 'results_exam_date' in plans[0]
+    assert 'results_subject_date' in plans[1]
+
+def test_batches_keep_re_stored_transcripts(store):
+    first = store.latest_per_pilot()
+    assert [result['hash'] for result in first] == ['a', 'b']
+    later = new_batch_id()
+    store.save(stored('c', 'pilot3', {'CRM': ('PASS', 90, None, '1-May-2024')}), later)
+    store.save(stored('b', 'pilot2', {'CRM': ('PASS', 95, None, '2-May-2024')}), later)
+    assert [result['hash'] for result in store.load_batch(later)] == ['c', 'b']
+    earlier = store._run(lambda conn: conn.execute('SELECT batch FROM batch_items WHERE hash = ?', ('a',)).fetchone()[0])
+    restored = store.load_batch(earlier)
+    assert [result['hash'] for result in restored] == ['a', 'b']
+    assert restored[1]['completed']['CRM'].score == 95
+    assert store.load_batch('unknown') == []
+
+def test_reparse_skips_text_from_older_extractor(store, monkeypatch):
+    from cts_analyzer import store as store_module
+    store.save(dict(stored('c', 'pilot3', {}), text="Training Transcript\nCRM\nExam\n90% Pass 1-May-2024",
+                    extraction={'backend': 'test', 'complete': True}), new_batch_id())
+    monkeypatch.setattr(store_module, 'parse_fingerprint', lambda: 'another')
+    monkeypatch.setattr(store_module, 'EXTRACTOR_VERSION', store_module.EXTRACTOR_VERSION + 1)
+    # Re-parsing outdated text would only reproduce the old extraction's results; the PDF must be analyzed again
+    assert store.reparse(max_workers=1) == (0, 1)
+    assert store.load_batch(store._run(lambda conn: conn.execute(
+        "SELECT batch FROM batch_items WHERE hash = 'c'").fetchone()[0]))[0]['completed'] == {}
+
+def test_reparse_replaces_results(store, monkeypatch):
+    from cts_analyzer import store as store_module
+    batch = new_batch_id()
+    store.save(dict(stored('c', 'pilot3', {}), text="Training Transcript\nCRM-ADM - Rotor Wing\nCRM Exam\n90% Pass 1-May-2024",
+                    extraction={'backend': 'test', 'complete': True}), batch)
+    monkeypatch.setattr(store_module, 'parse_fingerprint', lambda: 'another')
+    assert store.reparse(max_workers=1) == (1, 0)
+    assert store.load_batch(batch)[0]['completed'] == {'CRM': SubjectResult('PASS', 90, None, '1-May-2024')}
+    assert store.reparse(max_workers=1) == (0, 0)